@@ -2,7 +2,7 @@
 # --------------------
 
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple
+from typing import Any, List, Optional, Tuple, Union
 
 from core.lexer import *
 
@@ -27,6 +27,10 @@ class String(AST):
 class Char(AST):
     token: Token
 
+@dataclass
+class FString(AST):
+    parts: List[Union[str, AST]]  # literal text as str, interpolations as expressions
+
 @dataclass
 class Boolean(AST):
     token: Token
@@ -79,6 +83,7 @@ class CompoundAssign(AST):
 @dataclass
 class Block(AST):
     statements: List[AST]
+    declares: bool = field(default=True, init=False)  # False when it binds nothing and can share its parent's scope
 
 @dataclass
 class FunctionDef(AST):
@@ -89,6 +94,7 @@ class FunctionDef(AST):
     is_global: bool = False
     source_file: str = ""
     interpreter: Optional[Any] = None
+    binder: Optional[Any] = field(default=None, init=False, repr=False, compare=False)  # built on the first call
 
     def __call__(self, *args, **kwargs):
         if self.interpreter:
@@ -120,12 +126,14 @@ class IfStatement(AST):
 class WhileStatement(AST):
     condition: AST
     body: Block
+    reuse_scope: bool = field(default=False, init=False)  # one scope for every iteration, emptied in between
 
 @dataclass
 class ForStatement(AST):
     iterator_name: str
     iterable: AST
     body: Block
+    reuse_scope: bool = field(default=False, init=False)
 
 @dataclass
 class TryCatchStatement(AST):
@@ -143,17 +151,20 @@ class ImportStatement(AST):
 class FunctionCall(AST):
     name: str
     args: List[AST]
+    tail_call: bool = field(default=False, init=False)  # `return f(...)` inside f
 
 @dataclass
 class MethodCall(AST):
     obj: AST
     method_name: str
     args: List[AST]
+    inline_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)  # filled in at run time
 
 @dataclass
 class MemberAccess(AST):
     obj: AST
     member_name: str
+    inline_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
 
 @dataclass
 class IndexAccess(AST):
@@ -227,6 +238,7 @@ class EnumDef(AST):
 class LambdaExpr(AST):
     params: List[str]
     body: AST
+    binder: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
 
 @dataclass
 class TypeCheckOp(AST):
@@ -263,6 +275,7 @@ class AsyncFuncDef(AST):
     name: str
     params: List[Tuple[str, Optional[AST]]]
     body: AST
+    binder: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
 
 @dataclass
 class AwaitExpr(AST):
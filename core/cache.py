@@ -0,0 +1,96 @@
+# AST Cache
+# ---------
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from core.constants import *
+
+# ==========================================
+# AST CACHE
+# ==========================================
+
+# Parsed modules are stored in a __lunacache__ directory next to their source,
+# one file per module and Lunite version. Each file holds a small header
+# pickle followed by the AST pickle, so a stale entry is rejected without
+# unpickling the tree.
+#
+# A file run as a script has its macros expanded first, while imports and the
+# stream lexer parse the raw source, so the two get separate entries. Lexer
+# backends all produce the same tokens and share them.
+
+AST_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+def cache_file_for(path, preprocessed=True):
+    directory, name = os.path.split(os.path.abspath(path))
+    base = os.path.splitext(name)[0]
+    mode = "" if preprocessed else ".raw"
+    return os.path.join(directory, AST_CACHE_DIR, f"{base}{mode}.lunite-{LUNITE_VERSION_STR}.ast")
+
+def source_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_key(preprocessed):
+    return (LUNITE_VERSION_STR, AST_CACHE_FORMAT, preprocessed)
+
+def load_ast(path, preprocessed=True):
+    """Returns the cached AST for a source file, or None when there is no valid entry."""
+    try:
+        stat = os.stat(path)
+        with open(cache_file_for(path, preprocessed), 'rb') as f:
+            header = pickle.load(f)
+            if header['key'] != _cache_key(preprocessed):
+                raise ValueError("stale cache key")
+
+            # mtime and size are the cheap check; a touched but unchanged file
+            # still hits through the content hash
+            fresh = header['mtime'] == stat.st_mtime_ns and header['size'] == stat.st_size
+            if not fresh and header['digest'] != source_digest(path):
+                raise ValueError("stale cache entry")
+
+            ast = pickle.load(f)
+    except Exception:
+        AST_CACHE_STATS['misses'] += 1
+        return None
+
+    AST_CACHE_STATS['hits'] += 1
+    if not fresh:
+        store_ast(path, ast, preprocessed)
+    return ast
+
+def store_ast(path, ast, preprocessed=True):
+    """Writes the AST for a source file to the cache. Failures are ignored; the cache is optional."""
+    cache_file = cache_file_for(path, preprocessed)
+    tmp_path = None
+    try:
+        stat = os.stat(path)
+        header = {
+            'key': _cache_key(preprocessed),
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'digest': source_digest(path),
+        }
+        payload = pickle.dumps(header) + pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Write to a temporary file and rename it into place, so concurrent
+        # runs only ever see complete entries
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_file)
+        tmp_path = None
+    except Exception:
+        pass
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
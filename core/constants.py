@@ -11,6 +11,11 @@ LUNITE_VERSION_STR = "v1.9.9"
 COPYRIGHT          = "Copyright ANW, 2025-2026"
 LUNITE_USER_AGENT  = "Lunite/1.9.9"
 CURRENT_FILE       = "REPL"
+AST_CACHE_DIR      = "__lunacache__"
+AST_CACHE_FORMAT   = 8  # bump whenever the layout of AST nodes changes
+OPT_LEVEL          = 1  # AST optimisation level, set with -O on the command line
+ENGINE             = "visitor"  # tree-walking engine, set with --engine on the command line
+LEXER              = "classic"  # lexer backend, set with --lexer on the command line
 
 # ==========================================
 # SANDBOX RESOURCE LIMITS
@@ -32,57 +37,75 @@ RE_ID     = re.compile(r'[a-zA-Z_]\w*')
 # TOKENS LIST
 # ==========================================
 
-TokenType      = str
-TOKEN_INT      = 'INT'
-TOKEN_FLOAT    = 'FLOAT'
-TOKEN_STRING   = 'STRING'
-TOKEN_CHAR     = 'CHAR'
-TOKEN_ID       = 'ID'
-TOKEN_KEYWORD  = 'KEYWORD'
-TOKEN_PLUS     = 'PLUS'
-TOKEN_MINUS    = 'MINUS'
-TOKEN_MUL      = 'MUL'
-TOKEN_DIV      = 'DIV'
-TOKEN_MOD      = 'MOD'
-TOKEN_LPAREN   = 'LPAREN'
-TOKEN_RPAREN   = 'RPAREN'
-TOKEN_LBRACE   = 'LBRACE'
-TOKEN_RBRACE   = 'RBRACE'
-TOKEN_LBRACKET = 'LBRACKET'
-TOKEN_RBRACKET = 'RBRACKET'
-TOKEN_COLON    = 'COLON'
-TOKEN_COMMA    = 'COMMA'
-TOKEN_ASSIGN   = 'ASSIGN'
-TOKEN_EQ       = 'EQ'
-TOKEN_NEQ      = 'NEQ'
-TOKEN_GT       = 'GT'
-TOKEN_LT       = 'LT'
-TOKEN_GE       = 'GE'
-TOKEN_LE       = 'LE'
-TOKEN_EOF      = 'EOF'
-TOKEN_DOT      = 'DOT'
-TOKEN_QUESTION = 'QUESTION'
-TOKEN_BIT_AND  = 'BIT_AND'
-TOKEN_BIT_OR   = 'BIT_OR'
-TOKEN_BIT_XOR  = 'BIT_XOR'
-TOKEN_BIT_NOT  = 'BIT_NOT'
-TOKEN_LSHIFT   = 'LSHIFT'
-TOKEN_RSHIFT   = 'RSHIFT'
-TOKEN_PLUSEQ   = 'PLUSEQ'
-TOKEN_MINUSEQ  = 'MINUSEQ'
-TOKEN_MULEQ    = 'MULEQ'
-TOKEN_DIVEQ    = 'DIVEQ'
-TOKEN_MODEQ    = 'MODEQ'
-TOKEN_AND      = 'AND'
-TOKEN_OR       = 'OR'
-TOKEN_NOT      = 'NOT'
-TOKEN_FSTRING  = 'FSTRING'
-TOKEN_ARROW    = 'ARROW'
-TOKEN_IS       = 'IS'
-TOKEN_SEMI     = 'SEMI'
-TOKEN_INC      = 'INC'
-TOKEN_DEC      = 'DEC'
-TOKEN_AT       = 'AT'
+TokenType      = int
+TOKEN_INT      = 0
+TOKEN_FLOAT    = 1
+TOKEN_STRING   = 2
+TOKEN_CHAR     = 3
+TOKEN_ID       = 4
+TOKEN_KEYWORD  = 5
+TOKEN_PLUS     = 6
+TOKEN_MINUS    = 7
+TOKEN_MUL      = 8
+TOKEN_DIV      = 9
+TOKEN_MOD      = 10
+TOKEN_LPAREN   = 11
+TOKEN_RPAREN   = 12
+TOKEN_LBRACE   = 13
+TOKEN_RBRACE   = 14
+TOKEN_LBRACKET = 15
+TOKEN_RBRACKET = 16
+TOKEN_COLON    = 17
+TOKEN_COMMA    = 18
+TOKEN_ASSIGN   = 19
+TOKEN_EQ       = 20
+TOKEN_NEQ      = 21
+TOKEN_GT       = 22
+TOKEN_LT       = 23
+TOKEN_GE       = 24
+TOKEN_LE       = 25
+TOKEN_EOF      = 26
+TOKEN_DOT      = 27
+TOKEN_QUESTION = 28
+TOKEN_BIT_AND  = 29
+TOKEN_BIT_OR   = 30
+TOKEN_BIT_XOR  = 31
+TOKEN_BIT_NOT  = 32
+TOKEN_LSHIFT   = 33
+TOKEN_RSHIFT   = 34
+TOKEN_PLUSEQ   = 35
+TOKEN_MINUSEQ  = 36
+TOKEN_MULEQ    = 37
+TOKEN_DIVEQ    = 38
+TOKEN_MODEQ    = 39
+TOKEN_AND      = 40
+TOKEN_OR       = 41
+TOKEN_NOT      = 42
+TOKEN_FSTRING  = 43
+TOKEN_ARROW    = 44
+TOKEN_IS       = 45
+TOKEN_SEMI     = 46
+TOKEN_INC      = 47
+TOKEN_DEC      = 48
+TOKEN_AT       = 49
+
+# An f-string with interpolations is lexed as FSTRING_START, the tokens of each
+# interpolation, FSTRING_MIDDLE between interpolations and FSTRING_END; the
+# value of each is the raw literal text that follows its brace or quote
+TOKEN_FSTRING_START  = 50
+TOKEN_FSTRING_MIDDLE = 51
+TOKEN_FSTRING_END    = 52
+
+# Display names, indexed by token type
+TOKEN_NAMES = (
+    'INT', 'FLOAT', 'STRING', 'CHAR', 'ID', 'KEYWORD', 'PLUS', 'MINUS',
+    'MUL', 'DIV', 'MOD', 'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE', 'LBRACKET',
+    'RBRACKET', 'COLON', 'COMMA', 'ASSIGN', 'EQ', 'NEQ', 'GT', 'LT',
+    'GE', 'LE', 'EOF', 'DOT', 'QUESTION', 'BIT_AND', 'BIT_OR', 'BIT_XOR',
+    'BIT_NOT', 'LSHIFT', 'RSHIFT', 'PLUSEQ', 'MINUSEQ', 'MULEQ', 'DIVEQ', 'MODEQ',
+    'AND', 'OR', 'NOT', 'FSTRING', 'ARROW', 'IS', 'SEMI', 'INC',
+    'DEC', 'AT', 'FSTRING_START', 'FSTRING_MIDDLE', 'FSTRING_END',
+)
 
 # ==========================================
 # KEYWORDS LIST
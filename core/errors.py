@@ -42,4 +42,32 @@ class AdvanceException(Exception): pass
 
 class LeapException(Exception): 
     def __init__(self, target):
-        self.target = target
\ No newline at end of file
+        self.target = target
+
+class TailCallException(Exception):
+    def __init__(self, call):
+        self.call = call
+
+# ==========================================
+# COMPLETION SIGNALS
+# ==========================================
+
+# return/break/advance are handed back up the tree as visit results instead
+# of being raised. `kind` names the jump exception a completion stands for,
+# which is what gets raised when it reaches code that cannot take it. A tail
+# call's value is the function and the scope its arguments were bound into.
+
+class Completion:
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value=None):
+        self.kind = kind
+        self.value = value
+
+    def as_exception(self):
+        if self.kind is ReturnException or self.kind is TailCallException:
+            return self.kind(self.value)
+        return self.kind()
+
+BREAK = Completion(BreakException)
+ADVANCE = Completion(AdvanceException)
\ No newline at end of file
@@ -6,19 +6,25 @@ import pickle
 import struct
 import importlib
 import builtins
+import operator
 
-from core.lexer import Lexer, Token
+from core.lexer import Lexer, StreamLexer, Token, get_lexer_class
 from core.parser import Parser
+from core.cache import load_ast, store_ast
+from core.optimizer import optimize
 from core.ast import *
 from core.constants import *
-from runtime.interpreter import Interpreter, SafeModeResourceMonitor
+from runtime.interpreter import Interpreter, SafeModeResourceMonitor, make_memo
 import core.constants as constants
 
 BYTECODE_MAGIC = b"LUNITE-LBVM\x00"
-BYTECODE_VERSION = 1
+BYTECODE_VERSION = 3
 HEADER_FORMAT = "<12sI"
 HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
+# Instructions a sandboxed frame may run between resource checks
+SANDBOX_CHECK_INTERVAL = 1000
+
 OP_NOP = 0
 OP_LOAD_CONST = 1
 OP_LOAD_NAME = 2
@@ -70,7 +76,44 @@ OP_ASSERT = 47
 OP_SETUP_TRY = 48
 OP_POP_TRY = 49
 OP_BUILD_INSTANCE = 50
-
+OP_BUILD_STRING = 51
+OP_LOAD_FAST = 52
+OP_STORE_FAST = 53
+OP_LOAD_GLOBAL = 54
+
+# Superinstructions, only ever written by the peephole pass
+OP_INC_NAME = 55
+OP_INC_FAST = 56
+OP_LOAD_CONST_ADD = 57
+OP_COMPARE_GT_JUMP_IF_FALSE = 58
+OP_COMPARE_LT_JUMP_IF_FALSE = 59
+OP_COMPARE_GE_JUMP_IF_FALSE = 60
+OP_COMPARE_LE_JUMP_IF_FALSE = 61
+OP_COMPARE_EQ_JUMP_IF_FALSE = 62
+OP_COMPARE_NEQ_JUMP_IF_FALSE = 63
+
+OPCODES = {name: value for name, value in globals().items() if name.startswith('OP_')}
+
+# Marks a local slot that has not been assigned yet in the current call
+UNBOUND = object()
+
+
+def binary_handler(op):
+    # Shared body of the two-operand opcodes
+    def handler(self, frame, arg):
+        stack = frame.stack
+        right = stack.pop(); left = stack.pop(); stack.append(op(left, right))
+    return handler
+
+
+def compare_jump_handler(op):
+    # Shared body of the COMPARE_*_JUMP_IF_FALSE superinstructions
+    def handler(self, frame, arg):
+        stack = frame.stack
+        right = stack.pop(); left = stack.pop()
+        if not op(left, right):
+            frame.ip = arg
+    return handler
 
 class BytecodeProgram:
     def __init__(self, instructions, consts, names, source_file=None):
@@ -81,37 +124,53 @@ class BytecodeProgram:
 
 
 class FunctionObject:
-    def __init__(self, name, params, instructions, consts, names, source_file=None):
+    def __init__(self, name, params, instructions, consts, names, source_file=None, local_names=None):
         self.name = name
         self.params = params
         self.instructions = instructions
         self.consts = consts
         self.names = names
         self.source_file = source_file
+        # Slot i of a call's locals holds local_names[i]; the parameters
+        # come first, in order
+        self.local_names = local_names if local_names is not None else list(params)
 
     def __repr__(self):
         return f"<FunctionObject {self.name}({', '.join(self.params)})>"
 
 
+def const_key(value):
+    # Functions and classes are pooled by identity, so two definitions that
+    # happen to look alike keep their own slots. Everything else is pooled by
+    # type and value; the type keeps folded true/false from merging with 1/0
+    if isinstance(value, (FunctionObject, tuple)):
+        return (type(value), id(value))
+    return (type(value), value)
+
+
 class BytecodeCompiler:
     def __init__(self):
         self.consts = []
         self.names = []
+        self.const_index = {}
+        self.name_index = {}
         self.instructions = []
         self.loop_stack = []
 
     def add_const(self, value):
-        for idx, const in enumerate(self.consts):
-            if const == value:
-                return idx
-        self.consts.append(value)
-        return len(self.consts) - 1
+        key = const_key(value)
+        idx = self.const_index.get(key)
+        if idx is None:
+            idx = self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return idx
 
     def add_name(self, name):
-        if name in self.names:
-            return self.names.index(name)
-        self.names.append(name)
-        return len(self.names) - 1
+        idx = self.name_index.get(name)
+        if idx is None:
+            idx = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return idx
 
     def emit(self, opcode, arg=None):
         self.instructions.append((opcode, arg))
@@ -121,9 +180,28 @@ class BytecodeCompiler:
         opcode, _ = self.instructions[idx]
         self.instructions[idx] = (opcode, target)
 
+    def resolve_locals(self, params):
+        # Run over a finished function body: its parameters and every name
+        # it stores to become numbered slots, read and written with
+        # LOAD_FAST/STORE_FAST, and every other name is read with LOAD_GLOBAL
+        local_names = list(params)
+        slots = {name: slot for slot, name in enumerate(local_names)}
+        for opcode, arg in self.instructions:
+            if opcode == OP_STORE_NAME and self.names[arg] not in slots:
+                slots[self.names[arg]] = len(local_names)
+                local_names.append(self.names[arg])
+
+        for idx, (opcode, arg) in enumerate(self.instructions):
+            if opcode == OP_STORE_NAME:
+                self.instructions[idx] = (OP_STORE_FAST, slots[self.names[arg]])
+            elif opcode == OP_LOAD_NAME:
+                slot = slots.get(self.names[arg])
+                self.instructions[idx] = (OP_LOAD_GLOBAL, arg) if slot is None else (OP_LOAD_FAST, slot)
+        return local_names
+
     def is_expression(self, node):
         return isinstance(node, (
-            Number, String, Char, Boolean, Null, ListLiteral, DictLiteral, SetLiteral, TupleLiteral,
+            Number, String, FString, Char, Boolean, Null, ListLiteral, DictLiteral, SetLiteral, TupleLiteral,
             Identifier, UnaryOp, BinaryOp, TernaryOp, FunctionCall, MethodCall, MemberAccess,
             IndexAccess, SliceAccess, NewInstance, LambdaExpr, TypeCheckOp, UpdateExpr, AwaitExpr
         ))
@@ -140,6 +218,14 @@ class BytecodeCompiler:
     def compile_String(self, node):
         self.emit(OP_LOAD_CONST, self.add_const(node.token.value))
 
+    def compile_FString(self, node):
+        for part in node.parts:
+            if isinstance(part, str):
+                self.emit(OP_LOAD_CONST, self.add_const(part))
+            else:
+                self.compile(part)
+        self.emit(OP_BUILD_STRING, len(node.parts))
+
     def compile_Char(self, node):
         self.emit(OP_LOAD_CONST, self.add_const(node.token.value))
 
@@ -180,7 +266,7 @@ class BytecodeCompiler:
         elif node.op.type in (TOKEN_NOT, TOKEN_BIT_NOT):
             self.emit(OP_UNARY_NOT)
         else:
-            raise ValueError(f"[LBVM] Unsupported unary operator: {node.op.type}")
+            raise ValueError(f"[LBVM] Unsupported unary operator: {TOKEN_NAMES[node.op.type]}")
 
     def compile_BinaryOp(self, node):
         op_type = node.op.type
@@ -239,7 +325,7 @@ class BytecodeCompiler:
         elif op_type == TOKEN_NEQ:
             self.emit(OP_COMPARE_NEQ)
         else:
-            raise ValueError(f"[LBVM] Unsupported binary operator: {op_type}")
+            raise ValueError(f"[LBVM] Unsupported binary operator: {TOKEN_NAMES[op_type]}")
 
     def compile_TernaryOp(self, node):
         self.compile(node.condition)
@@ -300,7 +386,7 @@ class BytecodeCompiler:
             elif op_type == TOKEN_MODEQ:
                 self.emit(OP_BINARY_MOD)
             else:
-                raise ValueError(f"[LBVM] Unsupported compound assignment: {op_type}")
+                raise ValueError(f"[LBVM] Unsupported compound assignment: {TOKEN_NAMES[op_type]}")
             self.emit(OP_STORE_NAME, self.add_name(node.left.token.value))
         else:
             raise ValueError("[LBVM] Unsupported compound assignment target")
@@ -381,7 +467,8 @@ class BytecodeCompiler:
         func_compiler.emit(OP_LOAD_CONST, func_compiler.add_const(None))
         func_compiler.emit(OP_RETURN_VALUE)
         params = [p[0] if isinstance(p, tuple) else p for p in node.params]
-        func_obj = FunctionObject(node.name, params, func_compiler.instructions, func_compiler.consts, func_compiler.names, node.source_file)
+        local_names = func_compiler.resolve_locals(params)
+        func_obj = FunctionObject(node.name, params, func_compiler.instructions, func_compiler.consts, func_compiler.names, node.source_file, local_names)
         self.emit(OP_LOAD_CONST, self.add_const(func_obj))
         self.emit(OP_STORE_NAME, self.add_name(node.name))
 
@@ -436,6 +523,7 @@ class BytecodeCompiler:
             lambda_compiler.compile(node.body)
             
         lambda_compiler.emit(OP_RETURN_VALUE)
+        local_names = lambda_compiler.resolve_locals(node.params)
         
         lambda_func = FunctionObject(
             name="<lambda>",
@@ -443,7 +531,8 @@ class BytecodeCompiler:
             instructions=lambda_compiler.instructions,
             consts=lambda_compiler.consts,
             names=lambda_compiler.names,
-            source_file=""
+            source_file="",
+            local_names=local_names
         )
         
         self.emit(OP_LOAD_CONST, self.add_const(lambda_func))
@@ -561,14 +650,17 @@ class BytecodeCompiler:
 
 
 class Frame:
-    def __init__(self, instructions, consts, names, globals_, locals_, source_file=None):
+    def __init__(self, instructions, consts, names, globals_, locals_, source_file=None, local_names=None):
         self.instructions = instructions
         self.consts = consts
         self.names = names
         self.globals = globals_
+        # A dict for the top level, a list of slots for a function call
         self.locals = locals_
+        self.local_names = local_names
         self.stack = []
         self.ip = 0
+        self.try_blocks = []
         self.source_file = source_file
 
 
@@ -582,6 +674,8 @@ class BytecodeVM:
         self.globals = {}
         self.imported_files = {}
         self.current_file = program.source_file or constants.CURRENT_FILE
+        self.handlers = self._build_dispatch_table()
+        self.builtin_cache = {}
         self._build_standard_library()
 
         if self.safe_mode:
@@ -591,6 +685,8 @@ class BytecodeVM:
     def _build_standard_library(self):
         interpreter = Interpreter(safe_mode=False, debug=False)
         self.globals.update(interpreter.global_env.values)
+        self.globals['memo'] = make_memo(lambda func, args, kwargs: self._call_function(func, list(args)))
+        self.stringify = interpreter.stringify
 
     def _stop_monitor(self):
         if self.monitor:
@@ -609,24 +705,43 @@ class BytecodeVM:
             return getattr(builtins, name)
         raise NameError(f"[LBVM] Undefined name '{name}'")
 
+    def _load_global(self, frame, name):
+        value = frame.globals.get(name, UNBOUND)
+        if value is not UNBOUND:
+            return value
+        # The builtins module never changes under a running program, so a
+        # name found there only needs looking up once
+        value = self.builtin_cache.get(name, UNBOUND)
+        if value is UNBOUND:
+            if not hasattr(builtins, name):
+                raise NameError(f"[LBVM] Undefined name '{name}'")
+            value = self.builtin_cache[name] = getattr(builtins, name)
+        return value
+
     def _store_name(self, frame, name, value):
         frame.locals[name] = value
 
+    def _bind_args(self, func, args):
+        # Missing arguments are null; extra ones are dropped
+        count = len(func.params)
+        return args[:count] + [None] * (count - len(args)) + [UNBOUND] * (len(func.local_names) - count)
+
     def _call_function(self, func, args):
         if callable(func) and not isinstance(func, FunctionObject):
             return func(*args)
         if isinstance(func, FunctionObject):
-            locals_ = {name: args[i] if i < len(args) else None for i, name in enumerate(func.params)}
-            frame = Frame(func.instructions, func.consts, func.names, self.globals, locals_, source_file=func.source_file)
+            frame = Frame(func.instructions, func.consts, func.names, self.globals, self._bind_args(func, args),
+                          source_file=func.source_file, local_names=func.local_names)
             return self._execute_frame(frame)
         raise RuntimeError(f"[LBVM] '{type(func).__name__}' is not callable")
 
     def _load_attr(self, obj, attr_name):
-        if hasattr(obj, 'methods') and hasattr(obj, 'fields'):
-            if attr_name in getattr(obj, 'methods', {}):
+        if obj.__class__ is LuniteInstance:
+            if attr_name in obj.methods:
                 return obj.methods[attr_name]
-            if attr_name in getattr(obj, 'fields', {}):
-                return obj.fields[attr_name]
+            i = obj.shape.slots.get(attr_name)
+            if i is not None:
+                return obj.values[i]
         if hasattr(obj, attr_name):
             return getattr(obj, attr_name)
         raise AttributeError(f"[LBVM] Attribute '{attr_name}' not found")
@@ -660,12 +775,15 @@ class BytecodeVM:
             self.globals[alias] = self.imported_files[path]
             return self.imported_files[path]
 
-        with open(path, 'r', encoding='utf-8') as f:
-            source = f.read()
+        ast = load_ast(path, preprocessed=False)
+        if ast is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                ast = Parser(StreamLexer(f)).parse()
+            store_ast(path, ast, preprocessed=False)
 
         interpreter = Interpreter(safe_mode=self.safe_mode, debug=self.debug)
         interpreter.imported_files = self.imported_files
-        interpreter.visit(Parser(Lexer(source)).parse())
+        interpreter.execute(optimize(ast))
         module_obj = interpreter.global_env.values.get(alias)
         self.imported_files[path] = module_obj
         self.globals[alias] = module_obj
@@ -690,182 +808,484 @@ class BytecodeVM:
             return isinstance(value, (bytes, bytearray))
         return False
 
-    def _execute_frame(self, frame):
-        try_blocks = []
+    # ==========================================
+    # OPCODE HANDLERS
+    # ==========================================
+
+    # One method per opcode, named after it: OP_LOAD_CONST runs
+    # _op_load_const(frame, arg). A handler returns None to carry on with the
+    # next instruction; only RETURN_VALUE returns something, a 1-tuple holding
+    # the frame's result, so that returning null is still told apart.
+
+    def _build_dispatch_table(self):
+        # Indexed by opcode, so every instruction costs one list lookup no
+        # matter which opcode it is. Opcodes with no handler (NOP, TRY_EXCEPT
+        # and anything out of range of the compiler) raise when run.
+        table = [self._op_unknown] * 256
+        for name, opcode in OPCODES.items():
+            handler = getattr(self, f"_op_{name[3:].lower()}", None)
+            if handler is not None:
+                table[opcode] = handler
+        return table
+
+    def _op_unknown(self, frame, arg):
+        raise RuntimeError(f"[LBVM] Unknown opcode: {frame.instructions[frame.ip - 1][0]}")
+
+    def _op_load_const(self, frame, arg):
+        frame.stack.append(frame.consts[arg])
+
+    def _op_load_name(self, frame, arg):
+        frame.stack.append(self._load_name(frame, frame.names[arg]))
+
+    def _op_store_name(self, frame, arg):
+        self._store_name(frame, frame.names[arg], frame.stack.pop())
+
+    def _op_load_fast(self, frame, arg):
+        value = frame.locals[arg]
+        if value is UNBOUND:
+            # Not assigned yet in this call, so the name still means the global
+            value = self._load_global(frame, frame.local_names[arg])
+        frame.stack.append(value)
+
+    def _op_store_fast(self, frame, arg):
+        frame.locals[arg] = frame.stack.pop()
+
+    def _op_load_global(self, frame, arg):
+        value = frame.globals.get(frame.names[arg], UNBOUND)
+        if value is UNBOUND:
+            value = self._load_global(frame, frame.names[arg])
+        frame.stack.append(value)
+
+    def _op_inc_name(self, frame, arg):
+        name = frame.names[arg[0]]
+        self._store_name(frame, name, self._load_name(frame, name) + frame.consts[arg[1]])
+
+    def _op_inc_fast(self, frame, arg):
+        slot, const = arg
+        value = frame.locals[slot]
+        if value is UNBOUND:
+            value = self._load_global(frame, frame.local_names[slot])
+        frame.locals[slot] = value + frame.consts[const]
+
+    def _op_load_const_add(self, frame, arg):
+        stack = frame.stack
+        stack.append(stack.pop() + frame.consts[arg])
+
+    def _op_pop_top(self, frame, arg):
+        frame.stack.pop()
+
+    _op_binary_add = binary_handler(operator.add)
+    _op_binary_sub = binary_handler(operator.sub)
+    _op_binary_mul = binary_handler(operator.mul)
+    _op_binary_div = binary_handler(operator.truediv)
+    _op_binary_mod = binary_handler(operator.mod)
+    _op_bit_and = binary_handler(operator.and_)
+    _op_bit_or = binary_handler(operator.or_)
+    _op_bit_xor = binary_handler(operator.xor)
+    _op_lshift = binary_handler(operator.lshift)
+    _op_rshift = binary_handler(operator.rshift)
+    _op_compare_gt = binary_handler(operator.gt)
+    _op_compare_lt = binary_handler(operator.lt)
+    _op_compare_ge = binary_handler(operator.ge)
+    _op_compare_le = binary_handler(operator.le)
+    _op_compare_eq = binary_handler(operator.eq)
+    _op_compare_neq = binary_handler(operator.ne)
+    _op_compare_gt_jump_if_false = compare_jump_handler(operator.gt)
+    _op_compare_lt_jump_if_false = compare_jump_handler(operator.lt)
+    _op_compare_ge_jump_if_false = compare_jump_handler(operator.ge)
+    _op_compare_le_jump_if_false = compare_jump_handler(operator.le)
+    _op_compare_eq_jump_if_false = compare_jump_handler(operator.eq)
+    _op_compare_neq_jump_if_false = compare_jump_handler(operator.ne)
+
+    def _op_swap(self, frame, arg):
+        stack = frame.stack
+        a = stack.pop(); b = stack.pop(); stack.append(a); stack.append(b)
+
+    def _op_dup(self, frame, arg):
+        frame.stack.append(frame.stack[-1])
+
+    def _op_unary_neg(self, frame, arg):
+        frame.stack.append(-frame.stack.pop())
+
+    def _op_unary_not(self, frame, arg):
+        frame.stack.append(not frame.stack.pop())
+
+    def _op_jump(self, frame, arg):
+        frame.ip = arg
+
+    def _op_jump_if_false(self, frame, arg):
+        if not frame.stack.pop():
+            frame.ip = arg
+
+    def _op_jump_if_true(self, frame, arg):
+        if frame.stack.pop():
+            frame.ip = arg
+
+    def _op_call_function(self, frame, arg):
+        stack = frame.stack
+        args = [stack.pop() for _ in range(arg)][::-1]
+        func = stack.pop()
+        if (func.__class__ is FunctionObject and func.instructions is frame.instructions
+                and frame.instructions[frame.ip][0] == OP_RETURN_VALUE and not frame.try_blocks):
+            # `return f(...)` inside f: start this frame over with
+            # the new arguments instead of nesting another one
+            frame.locals = self._bind_args(func, args)
+            frame.stack = []
+            frame.ip = 0
+        else:
+            stack.append(self._call_function(func, args))
 
-        while frame.ip < len(frame.instructions):
-            self._check_sandbox()
-            opcode, arg = frame.instructions[frame.ip]
-            frame.ip += 1
+    def _op_return_value(self, frame, arg):
+        return (frame.stack.pop() if frame.stack else None,)
 
-            if self.debug:
-                print(f"[LBVM] [DEBUG] {frame.ip - 1}: {opcode} {arg}")
-            
+    def _op_build_list(self, frame, arg):
+        frame.stack.append([frame.stack.pop() for _ in range(arg)][::-1])
+
+    def _op_build_dict(self, frame, arg):
+        stack = frame.stack
+        mapping = {}
+        for _ in range(arg):
+            value = stack.pop(); key = stack.pop()
+            mapping[key] = value
+        stack.append(mapping)
+
+    def _op_build_tuple(self, frame, arg):
+        frame.stack.append(tuple(frame.stack.pop() for _ in range(arg))[::-1])
+
+    def _op_build_set(self, frame, arg):
+        frame.stack.append({frame.stack.pop() for _ in range(arg)})
+
+    def _op_build_string(self, frame, arg):
+        parts = [frame.stack.pop() for _ in range(arg)][::-1]
+        frame.stack.append(''.join([part if part.__class__ is str else self.stringify(part) for part in parts]))
+
+    def _op_import_py(self, frame, arg):
+        module_name, alias, source_package = arg
+        self._import_python_module(module_name, alias, source_package)
+
+    def _op_import_module(self, frame, arg):
+        module_name, alias, source_package = arg
+        self._import_luna_module(module_name, alias, source_package)
+
+    def _op_load_attr(self, frame, arg):
+        obj = frame.stack.pop()
+        frame.stack.append(self._load_attr(obj, arg))
+
+    def _op_call_method(self, frame, arg):
+        stack = frame.stack
+        args = [stack.pop() for _ in range(arg[1])][::-1]
+        obj = stack.pop()
+        stack.append(self._call_method(obj, arg[0], args))
+
+    def _op_load_subscript(self, frame, arg):
+        stack = frame.stack
+        index = stack.pop(); target = stack.pop(); stack.append(target[index])
+
+    def _op_store_subscript(self, frame, arg):
+        stack = frame.stack
+        value = stack.pop(); index = stack.pop(); target = stack.pop(); target[index] = value
+
+    def _op_store_attr(self, frame, arg):
+        stack = frame.stack
+        value = stack.pop(); obj = stack.pop(); setattr(obj, arg, value)
+
+    def _op_get_iter(self, frame, arg):
+        frame.stack.append(iter(frame.stack.pop()))
+
+    def _op_iter_next(self, frame, arg):
+        stack = frame.stack
+        try:
+            stack.append(next(stack[-1]))
+            stack.append(True)
+        except StopIteration:
+            stack.append(False)
+
+    def _op_type_check(self, frame, arg):
+        stack = frame.stack
+        target_type = stack.pop(); value = stack.pop(); stack.append(self._type_check(value, target_type))
+
+    def _op_unpack_sequence(self, frame, arg):
+        seq = frame.stack.pop()
+        if len(seq) < arg:
+            raise ValueError(f"[LBVM] Not enough values to unpack (expected {arg}, got {len(seq)})")
+        for item in reversed(list(seq)[:arg]):
+            frame.stack.append(item)
+
+    def _op_build_slice(self, frame, arg):
+        stack = frame.stack
+        end = stack.pop()
+        start = stack.pop()
+        target = stack.pop()
+        stack.append(target[start:end])
+
+    def _op_assert(self, frame, arg):
+        msg = frame.stack.pop()
+        cond = frame.stack.pop()
+        if not cond:
+            raise RuntimeError(f"[LBVM] Assertion failed: {msg}")
+
+    def _op_build_instance(self, frame, arg):
+        stack = frame.stack
+        args = [stack.pop() for _ in range(arg)][::-1]
+        cls = stack.pop()
+        if isinstance(cls, tuple) and cls[0] == '__lunite_class__':
+            instance = type(cls[1], (), {})()
+            instance.__dict__.update(cls[2])
+            stack.append(instance)
+        else:
+            stack.append(cls(*args))
+
+    def _op_setup_try(self, frame, arg):
+        frame.try_blocks.append(arg)
+
+    def _op_pop_try(self, frame, arg):
+        if frame.try_blocks: frame.try_blocks.pop()
+
+    # ==========================================
+    # EXECUTION
+    # ==========================================
+
+    # A frame picks its loop as it starts. Plain runs get one with nothing
+    # but fetch and dispatch in it; debug and sandbox runs get one that
+    # prints each instruction and checks the sandbox now and then.
+
+    def _execute_frame(self, frame):
+        if self.debug or self.safe_mode:
+            return self._run_instrumented(frame)
+        return self._run_plain(frame)
+
+    def _route_exception(self, frame, e):
+        # Jump to the innermost attempt's rescue with the message on the
+        # stack, or re-raise if the frame has none
+        if not frame.try_blocks:
+            raise e
+        frame.ip = frame.try_blocks.pop()
+        frame.stack.append(getattr(e, "message_only", str(e)))
+
+    def _run_plain(self, frame):
+        handlers = self.handlers
+        instructions = frame.instructions
+        end = len(instructions)
+
+        # The try is entered again only after an exception was rescued,
+        # not once per instruction
+        while True:
             try:
-                if opcode == OP_LOAD_CONST:
-                    frame.stack.append(frame.consts[arg])
-                elif opcode == OP_LOAD_NAME:
-                    frame.stack.append(self._load_name(frame, frame.names[arg]))
-                elif opcode == OP_STORE_NAME:
-                    self._store_name(frame, frame.names[arg], frame.stack.pop())
-                elif opcode == OP_POP_TOP:
-                    frame.stack.pop()
-                elif opcode == OP_BINARY_ADD:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left + right)
-                elif opcode == OP_BINARY_SUB:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left - right)
-                elif opcode == OP_BINARY_MUL:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left * right)
-                elif opcode == OP_BINARY_DIV:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left / right)
-                elif opcode == OP_BINARY_MOD:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left % right)
-                elif opcode == OP_BIT_AND:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left & right)
-                elif opcode == OP_BIT_OR:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left | right)
-                elif opcode == OP_BIT_XOR:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left ^ right)
-                elif opcode == OP_LSHIFT:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left << right)
-                elif opcode == OP_RSHIFT:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left >> right)
-                elif opcode == OP_SWAP:
-                    a = frame.stack.pop(); b = frame.stack.pop(); frame.stack.append(a); frame.stack.append(b)
-                elif opcode == OP_DUP:
-                    frame.stack.append(frame.stack[-1])
-                elif opcode == OP_UNARY_NEG:
-                    frame.stack.append(-frame.stack.pop())
-                elif opcode == OP_UNARY_NOT:
-                    frame.stack.append(not frame.stack.pop())
-                elif opcode == OP_COMPARE_GT:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left > right)
-                elif opcode == OP_COMPARE_LT:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left < right)
-                elif opcode == OP_COMPARE_GE:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left >= right)
-                elif opcode == OP_COMPARE_LE:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left <= right)
-                elif opcode == OP_COMPARE_EQ:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left == right)
-                elif opcode == OP_COMPARE_NEQ:
-                    right = frame.stack.pop(); left = frame.stack.pop(); frame.stack.append(left != right)
-                elif opcode == OP_JUMP:
-                    frame.ip = arg
-                elif opcode == OP_JUMP_IF_FALSE:
-                    if not frame.stack.pop():
-                        frame.ip = arg
-                elif opcode == OP_JUMP_IF_TRUE:
-                    if frame.stack.pop():
-                        frame.ip = arg
-                elif opcode == OP_CALL_FUNCTION:
-                    args = [frame.stack.pop() for _ in range(arg)][::-1]
-                    func = frame.stack.pop()
-                    frame.stack.append(self._call_function(func, args))
-                elif opcode == OP_RETURN_VALUE:
-                    return frame.stack.pop() if frame.stack else None
-                elif opcode == OP_BUILD_LIST:
-                    frame.stack.append([frame.stack.pop() for _ in range(arg)][::-1])
-                elif opcode == OP_BUILD_DICT:
-                    mapping = {}
-                    for _ in range(arg):
-                        value = frame.stack.pop(); key = frame.stack.pop()
-                        mapping[key] = value
-                    frame.stack.append(mapping)
-                elif opcode == OP_BUILD_TUPLE:
-                    frame.stack.append(tuple(frame.stack.pop() for _ in range(arg))[::-1])
-                elif opcode == OP_BUILD_SET:
-                    frame.stack.append({frame.stack.pop() for _ in range(arg)})
-                elif opcode == OP_IMPORT_PY:
-                    module_name, alias, source_package = arg
-                    self._import_python_module(module_name, alias, source_package)
-                elif opcode == OP_IMPORT_MODULE:
-                    module_name, alias, source_package = arg
-                    self._import_luna_module(module_name, alias, source_package)
-                elif opcode == OP_LOAD_ATTR:
-                    obj = frame.stack.pop()
-                    frame.stack.append(self._load_attr(obj, arg))
-                elif opcode == OP_CALL_METHOD:
-                    args = [frame.stack.pop() for _ in range(arg[1])][::-1]
-                    obj = frame.stack.pop()
-                    frame.stack.append(self._call_method(obj, arg[0], args))
-                elif opcode == OP_LOAD_SUBSCRIPT:
-                    index = frame.stack.pop(); target = frame.stack.pop(); frame.stack.append(target[index])
-                elif opcode == OP_STORE_SUBSCRIPT:
-                    value = frame.stack.pop(); index = frame.stack.pop(); target = frame.stack.pop(); target[index] = value
-                elif opcode == OP_STORE_ATTR:
-                    value = frame.stack.pop(); obj = frame.stack.pop(); setattr(obj, arg, value)
-                elif opcode == OP_GET_ITER:
-                    frame.stack.append(iter(frame.stack.pop()))
-                elif opcode == OP_ITER_NEXT:
-                    iterator = frame.stack[-1]
-                    try:
-                        frame.stack.append(next(iterator))
-                        frame.stack.append(True)
-                    except StopIteration:
-                        frame.stack.append(False)
-                elif opcode == OP_TYPE_CHECK:
-                    target_type = frame.stack.pop(); value = frame.stack.pop(); frame.stack.append(self._type_check(value, target_type))
-                elif opcode == OP_UNPACK_SEQUENCE:
-                    seq = frame.stack.pop()
-                    if len(seq) < arg:
-                        raise ValueError(f"[LBVM] Not enough values to unpack (expected {arg}, got {len(seq)})")
-                    for item in reversed(list(seq)[:arg]):
-                        frame.stack.append(item)
-                elif opcode == OP_BUILD_SLICE:
-                    end = frame.stack.pop()
-                    start = frame.stack.pop()
-                    target = frame.stack.pop()
-                    frame.stack.append(target[start:end])
-                elif opcode == OP_ASSERT:
-                    msg = frame.stack.pop()
-                    cond = frame.stack.pop()
-                    if not cond:
-                        raise RuntimeError(f"[LBVM] Assertion failed: {msg}")
-                elif opcode == OP_BUILD_INSTANCE:
-                    args = [frame.stack.pop() for _ in range(arg)][::-1]
-                    cls = frame.stack.pop()
-                    if isinstance(cls, tuple) and cls[0] == '__lunite_class__':
-                        instance = type(cls[1], (), {})()
-                        instance.__dict__.update(cls[2])
-                        frame.stack.append(instance)
-                    else:
-                        frame.stack.append(cls(*args))
-                elif opcode == OP_SETUP_TRY:
-                    try_blocks.append(arg)
-                elif opcode == OP_POP_TRY:
-                    if try_blocks: try_blocks.pop()
-                else:
-                    raise RuntimeError(f"[LBVM] Unknown opcode: {opcode}")
+                while frame.ip < end:
+                    opcode, arg = instructions[frame.ip]
+                    frame.ip += 1
+                    result = handlers[opcode](frame, arg)
+                    if result is not None:
+                        return result[0]
+                return None
             except Exception as e:
-                if try_blocks:
-                    catch_ip = try_blocks.pop()
-                    frame.ip = catch_ip
-                    frame.stack.append(getattr(e, "message_only", str(e)))
-                else:
-                    raise e
+                self._route_exception(frame, e)
+
+    def _run_instrumented(self, frame):
+        handlers = self.handlers
+        instructions = frame.instructions
+        end = len(instructions)
+        debug = self.debug
+
+        # Straight-line code always runs out, so the sandbox only needs
+        # checking when a frame starts (every call) and when control jumps
+        # back (every loop), and there only once the budget is spent
+        self._check_sandbox()
+        budget = SANDBOX_CHECK_INTERVAL
+        last_ip = -1
+
+        while frame.ip < end:
+            ip = frame.ip
+            budget -= 1
+            if ip <= last_ip and budget <= 0:
+                self._check_sandbox()
+                budget = SANDBOX_CHECK_INTERVAL
+            last_ip = ip
+            opcode, arg = instructions[ip]
+            frame.ip = ip + 1
+
+            if debug:
+                print(f"[LBVM] [DEBUG] {ip}: {opcode} {arg}")
+
+            try:
+                result = handlers[opcode](frame, arg)
+                if result is not None:
+                    return result[0]
+            except Exception as e:
+                self._route_exception(frame, e)
         return None
 
     def run(self):
         try:
-            frame = Frame(self.program.instructions, self.program.consts, self.program.names, self.globals, {}, source_file=self.program.source_file)
+            # Top-level names are globals, so functions can see each other
+            # and themselves
+            frame = Frame(self.program.instructions, self.program.consts, self.program.names, self.globals, self.globals, source_file=self.program.source_file)
             return self._execute_frame(frame)
         finally:
             self._stop_monitor()
 
 
-def compile_ast_to_bytecode(source, source_file=None):
-    lexer = Lexer(source)
-    tokens = list(lexer)
-    parser = Parser(tokens)
-    ast = parser.parse()
+# ==========================================
+# PEEPHOLE OPTIMISER
+# ==========================================
+
+# Runs over finished bytecode, a program's and each of its functions',
+# rewriting short instruction sequences into fewer, cheaper ones:
+# - `x++`, `++x`, `x += c` and `x = x + c` as statements become INC_NAME or
+#   INC_FAST, and any other `LOAD_CONST c, BINARY_ADD` becomes LOAD_CONST_ADD
+# - a comparison followed by JUMP_IF_FALSE becomes one COMPARE_*_JUMP_IF_FALSE
+# - jumps that land on an unconditional JUMP go straight to its target, and
+#   JUMPs to the very next instruction are dropped
+# - instructions no path can reach, like those after a RETURN_VALUE, are dropped
+# A sequence is only fused when no jump lands inside it.
+
+JUMP_OPCODES = {
+    OP_JUMP, OP_JUMP_IF_FALSE, OP_JUMP_IF_TRUE, OP_SETUP_TRY,
+    OP_COMPARE_GT_JUMP_IF_FALSE, OP_COMPARE_LT_JUMP_IF_FALSE, OP_COMPARE_GE_JUMP_IF_FALSE,
+    OP_COMPARE_LE_JUMP_IF_FALSE, OP_COMPARE_EQ_JUMP_IF_FALSE, OP_COMPARE_NEQ_JUMP_IF_FALSE,
+}
+
+COMPARE_JUMPS = {
+    OP_COMPARE_GT: OP_COMPARE_GT_JUMP_IF_FALSE,
+    OP_COMPARE_LT: OP_COMPARE_LT_JUMP_IF_FALSE,
+    OP_COMPARE_GE: OP_COMPARE_GE_JUMP_IF_FALSE,
+    OP_COMPARE_LE: OP_COMPARE_LE_JUMP_IF_FALSE,
+    OP_COMPARE_EQ: OP_COMPARE_EQ_JUMP_IF_FALSE,
+    OP_COMPARE_NEQ: OP_COMPARE_NEQ_JUMP_IF_FALSE,
+}
+
+# load opcode -> (store opcode, fused increment)
+INCREMENTS = {
+    OP_LOAD_NAME: (OP_STORE_NAME, OP_INC_NAME),
+    OP_LOAD_FAST: (OP_STORE_FAST, OP_INC_FAST),
+}
+
+
+def jump_targets(instructions):
+    return {arg for opcode, arg in instructions if opcode in JUMP_OPCODES}
+
+
+def relocate(instructions, replacements):
+    # replacements: old index -> new instruction, or None to drop it. Jumps
+    # to a dropped instruction go to the next one that is kept
+    kept = []
+    new_index = [0] * (len(instructions) + 1)
+    for idx, instruction in enumerate(instructions):
+        new_index[idx] = len(kept)
+        instruction = replacements.get(idx, instruction)
+        if instruction is not None:
+            kept.append(instruction)
+    new_index[len(instructions)] = len(kept)
+    return [(opcode, new_index[arg]) if opcode in JUMP_OPCODES else (opcode, arg) for opcode, arg in kept]
+
+
+def match_increment(instructions, idx):
+    # Length and fused form of an increment statement starting at idx
+    opcode, target = instructions[idx]
+    if opcode not in INCREMENTS:
+        return None
+    store, fused = INCREMENTS[opcode]
+    ops = [op for op, _ in instructions[idx:idx + 9]]
+    args = [arg for _, arg in instructions[idx:idx + 9]]
+    # x += c, x = x + c
+    if ops[1:4] == [OP_LOAD_CONST, OP_BINARY_ADD, store] and args[3] == target:
+        return 4, (fused, (target, args[1]))
+    # x++ and ++x with their results thrown away
+    if ops[1:6] == [OP_DUP, OP_LOAD_CONST, OP_BINARY_ADD, OP_DUP, store] and args[5] == target:
+        if ops[6:8] == [OP_POP_TOP, OP_POP_TOP]:
+            return 8, (fused, (target, args[2]))
+        if ops[6:9] == [OP_SWAP, OP_POP_TOP, OP_POP_TOP]:
+            return 9, (fused, (target, args[2]))
+    return None
+
+
+def fuse_instructions(instructions):
+    targets = jump_targets(instructions)
+    replacements = {}
+    idx = 0
+    while idx < len(instructions):
+        opcode, arg = instructions[idx]
+        match = match_increment(instructions, idx)
+        if match is None and idx + 1 < len(instructions):
+            next_opcode, next_arg = instructions[idx + 1]
+            if opcode == OP_LOAD_CONST and next_opcode == OP_BINARY_ADD:
+                match = 2, (OP_LOAD_CONST_ADD, arg)
+            elif opcode in COMPARE_JUMPS and next_opcode == OP_JUMP_IF_FALSE:
+                match = 2, (COMPARE_JUMPS[opcode], next_arg)
+        if match is not None and not any(i in targets for i in range(idx + 1, idx + match[0])):
+            length, fused = match
+            replacements[idx] = fused
+            for i in range(idx + 1, idx + length):
+                replacements[i] = None
+            idx += length
+        else:
+            idx += 1
+    return relocate(instructions, replacements)
+
+
+def thread_jumps(instructions):
+    threaded = []
+    for opcode, arg in instructions:
+        if opcode in JUMP_OPCODES and opcode != OP_SETUP_TRY:
+            seen = set()
+            while arg < len(instructions) and instructions[arg][0] == OP_JUMP and arg not in seen:
+                seen.add(arg)
+                arg = instructions[arg][1]
+        threaded.append((opcode, arg))
+    return threaded
+
+
+def drop_dead_code(instructions):
+    reachable = set()
+    pending = [0]
+    while pending:
+        idx = pending.pop()
+        if idx in reachable or idx >= len(instructions):
+            continue
+        reachable.add(idx)
+        opcode, arg = instructions[idx]
+        if opcode in JUMP_OPCODES:
+            pending.append(arg)
+        if opcode != OP_JUMP and opcode != OP_RETURN_VALUE:
+            pending.append(idx + 1)
+
+    replacements = {idx: None for idx in range(len(instructions)) if idx not in reachable}
+    for idx, (opcode, arg) in enumerate(instructions):
+        if opcode == OP_JUMP and arg == idx + 1 and idx in reachable:
+            replacements[idx] = None
+    return relocate(instructions, replacements)
+
+
+def optimize_instructions(instructions):
+    instructions = fuse_instructions(instructions)
+    while True:
+        optimized = drop_dead_code(thread_jumps(instructions))
+        if optimized == instructions:
+            return instructions
+        instructions = optimized
+
+
+def optimize_bytecode(code):
+    # A BytecodeProgram or FunctionObject, and every function nested in it
+    code.instructions = optimize_instructions(code.instructions)
+    for const in code.consts:
+        if isinstance(const, FunctionObject):
+            optimize_bytecode(const)
+    return code
+
+
+def compile_ast_to_bytecode(source, source_file=None, lexer_backend="classic", peephole=True):
+    lexer = get_lexer_class(lexer_backend)(source)
+    parser = Parser(lexer)
+    ast = optimize(parser.parse())
     compiler = BytecodeCompiler()
     compiler.compile(ast)
-    return BytecodeProgram(compiler.instructions, compiler.consts, compiler.names, source_file)
+    program = BytecodeProgram(compiler.instructions, compiler.consts, compiler.names, source_file)
+    return optimize_bytecode(program) if peephole else program
 
 
-def save_bytecode(path, source, source_file=None):
-    program = compile_ast_to_bytecode(source, source_file)
+def save_bytecode(path, source, source_file=None, lexer_backend="classic"):
+    program = compile_ast_to_bytecode(source, source_file, lexer_backend)
     payload = pickle.dumps(program)
     with open(path, "wb") as f:
         f.write(struct.pack(HEADER_FORMAT, BYTECODE_MAGIC, BYTECODE_VERSION))
@@ -1,6 +1,11 @@
 # Lexer
 # -----
 
+import codecs
+import io
+import re
+from array import array
+from bisect import bisect_left
 from dataclasses import dataclass
 from typing import Any
 
@@ -19,6 +24,9 @@ class Token:
     line: int
     col: int
 
+    def __repr__(self):
+        return f"Token(type={TOKEN_NAMES[self.type]!r}, value={self.value!r}, line={self.line!r}, col={self.col!r})"
+
 class Lexer:
     def __init__(self, source_code, start_line=1, start_col=1):
         self.source = source_code
@@ -26,6 +34,8 @@ class Lexer:
         self.line = start_line
         self.col = start_col
         self.current_char = self.source[0] if self.source else None
+        # Brace depth inside each open f-string interpolation, innermost last
+        self.fstring_depths = []
 
     def advance(self):
         if self.current_char == '\n':
@@ -167,21 +177,25 @@ class Lexer:
         start_line = self.line
         self.advance()
         self.advance()
-        
+        return self.make_fstring_text(TOKEN_FSTRING_START, TOKEN_FSTRING, start_line, start_col)
+
+    def make_fstring_text(self, open_type, close_type, start_line, start_col):
+        # Read literal f-string text up to an interpolation or the closing quote.
+        # An interpolation's tokens are then lexed in place by get_next_token,
+        # until the '}' that closes it resumes the literal text.
         raw_s = ""
-        brace_depth = 0
         
         while self.current_char is not None:
             char = self.current_char
             
-            if char == '"' and brace_depth == 0:
+            if char == '"':
                 self.advance()
-                return Token(TOKEN_FSTRING, raw_s, start_line, start_col)
+                return Token(close_type, raw_s, start_line, start_col)
             
             if char == '{':
-                brace_depth += 1
-            elif char == '}':
-                if brace_depth > 0: brace_depth -= 1
+                self.advance()
+                self.fstring_depths.append(0)
+                return Token(open_type, raw_s, start_line, start_col)
             
             if char == '\\':
                 raw_s += char
@@ -327,9 +341,18 @@ class Lexer:
             
             if self.current_char == '{':
                 self.advance()
+                if self.fstring_depths:
+                    self.fstring_depths[-1] += 1
                 return Token(TOKEN_LBRACE, '{', self.line, start_col)
             
             if self.current_char == '}':
+                if self.fstring_depths:
+                    if self.fstring_depths[-1] == 0:
+                        self.fstring_depths.pop()
+                        start_line = self.line
+                        self.advance()
+                        return self.make_fstring_text(TOKEN_FSTRING_MIDDLE, TOKEN_FSTRING_END, start_line, start_col)
+                    self.fstring_depths[-1] -= 1
                 self.advance()
                 return Token(TOKEN_RBRACE, '}', self.line, start_col)
             
@@ -392,3 +415,358 @@ class Lexer:
             yield token
             if token.type == TOKEN_EOF:
                 break
+
+
+# ==========================================
+# REGEX LEXER
+# ==========================================
+
+KEYWORD_TOKENS = {kw: TOKEN_KEYWORD for kw in KEYWORDS}
+KEYWORD_TOKENS.update({'and': TOKEN_AND, 'or': TOKEN_OR, 'not': TOKEN_NOT, 'is': TOKEN_IS})
+
+OPERATOR_TOKENS = {
+    '&&': TOKEN_AND,     '||': TOKEN_OR,      '<<': TOKEN_LSHIFT,  '<=': TOKEN_LE,
+    '>>': TOKEN_RSHIFT,  '>=': TOKEN_GE,      '++': TOKEN_INC,     '+=': TOKEN_PLUSEQ,
+    '--': TOKEN_DEC,     '-=': TOKEN_MINUSEQ, '*=': TOKEN_MULEQ,   '/=': TOKEN_DIVEQ,
+    '%=': TOKEN_MODEQ,   '=>': TOKEN_ARROW,   '==': TOKEN_EQ,      '!=': TOKEN_NEQ,
+    '&': TOKEN_BIT_AND,  '|': TOKEN_BIT_OR,   '^': TOKEN_BIT_XOR,  '~': TOKEN_BIT_NOT,
+    '<': TOKEN_LT,       '>': TOKEN_GT,       '+': TOKEN_PLUS,     '-': TOKEN_MINUS,
+    '*': TOKEN_MUL,      '/': TOKEN_DIV,      '%': TOKEN_MOD,      '(': TOKEN_LPAREN,
+    ')': TOKEN_RPAREN,   '{': TOKEN_LBRACE,   '}': TOKEN_RBRACE,   '[': TOKEN_LBRACKET,
+    ']': TOKEN_RBRACKET, ':': TOKEN_COLON,    ';': TOKEN_SEMI,     ',': TOKEN_COMMA,
+    '.': TOKEN_DOT,      '?': TOKEN_QUESTION, '=': TOKEN_ASSIGN,   '!': TOKEN_NOT,
+    '@': TOKEN_AT,
+}
+
+# One named group per token kind that carries a value; operators share one group
+# and, like keywords, are resolved by a dict lookup on the matched text. Order
+# matters: anything the fast patterns cannot handle (escapes, f-string
+# interpolations, bad input) falls through to SLOW or to no match at all, which
+# hands the token to the classic Lexer. Inside an interpolation the classic
+# Lexer also takes every brace, since it keeps the interpolation depth.
+TOKEN_PATTERNS = [
+    ('COMMENT',      r'~~[^\n]*\n?|~\*[\s\S]*?(?:\*~|\Z)'),
+    ('FSTRING',      r'f"[^"{}\\]*"'),
+    ('ID',           RE_ID.pattern),
+    ('FLOAT',        r'\d+\.\d*|\.\d+'),
+    ('INT',          r'\d+'),
+    ('OP',           '|'.join(re.escape(op) for op in sorted(OPERATOR_TOKENS, key=len, reverse=True))),
+    ('STRING',       r'"[^"\\]*"'),
+    ('CHAR',         r"'[^'\\]'"),
+    ('SLOW',         r'["\']'),
+    ('EOF',          r'\Z'),
+]
+
+FSTRING_BRACES = ('{', '}')
+
+RE_MASTER = re.compile(r'\s*(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_PATTERNS) + ')')
+
+class RegexLexer(Lexer):
+    """Lexer backend driven by one compiled master pattern.
+
+    Produces exactly the same Token stream as Lexer. Columns are derived from
+    the offset of the current line start instead of being counted per char.
+    """
+
+    def __init__(self, source_code, start_line=1, start_col=1):
+        super().__init__(source_code, start_line, start_col)
+        self.col_base = start_col
+        self.eof_bias = 0
+
+    def _slow_token(self):
+        # Sync the classic Lexer state and let it produce exactly one token
+        self.current_char = self.source[self.pos] if self.pos < len(self.source) else None
+        self.col = self.pos + self.col_base
+        token = Lexer.get_next_token(self)
+        self.col_base = self.col - self.pos
+        return token
+
+    def _refill(self):
+        # The whole source is in memory, so there is never more to read
+        return False
+
+    def get_next_token(self):
+        while True:
+            source = self.source
+            pos = self.pos
+            m = RE_MASTER.match(source, pos)
+            if m is None:
+                return self._slow_token()
+
+            kind = m.lastgroup
+            start = m.start(kind)
+            if start != pos:
+                newlines = source.count('\n', pos, start)
+                if newlines:
+                    self.line += newlines
+                    self.col_base = -source.rindex('\n', pos, start)
+
+            if kind == 'OP':
+                text = m.group(kind)
+                if (text == '.' and source[start + 1:start + 2].isdigit()) or (self.fstring_depths and text in FSTRING_BRACES):
+                    self.pos = start
+                    return self._slow_token()
+                self.pos = m.end()
+                return Token(OPERATOR_TOKENS[text], text, self.line, start + self.col_base)
+
+            if kind == 'ID':
+                text = m.group(kind)
+                if text == 'f' and source[start + 1:start + 2] == '"':
+                    self.pos = start
+                    return self._slow_token()
+                self.pos = m.end()
+                return Token(KEYWORD_TOKENS.get(text, TOKEN_ID), text, self.line, start + self.col_base)
+
+            if kind == 'INT':
+                self.pos = m.end()
+                return Token(TOKEN_INT, int(m.group(kind)), self.line, start + self.col_base)
+
+            if kind == 'FLOAT':
+                self.pos = m.end()
+                return Token(TOKEN_FLOAT, float(m.group(kind)), self.line, start + self.col_base)
+
+            if kind == 'COMMENT':
+                text = m.group(kind)
+                if text[1] == '*' and not text.endswith('*~') and self._refill_at(start):
+                    continue
+                self.pos = m.end()
+                newlines = text.count('\n')
+                if newlines:
+                    self.line += newlines
+                    self.col_base = -(start + text.rindex('\n'))
+                elif text[1] == '~':
+                    # The classic Lexer steps one column past a '~~' comment that ends the file
+                    self.eof_bias = 1
+                continue
+
+            if kind == 'STRING' or kind == 'CHAR' or kind == 'FSTRING':
+                text = m.group(kind)
+                self.pos = m.end()
+                if kind == 'FSTRING':
+                    token = Token(TOKEN_FSTRING, text[2:-1], self.line, start + self.col_base)
+                else:
+                    token = Token(TOKEN_STRING if kind == 'STRING' else TOKEN_CHAR, text[1:-1], self.line, start + self.col_base)
+                newlines = text.count('\n')
+                if newlines:
+                    self.line += newlines
+                    self.col_base = -(start + text.rindex('\n'))
+                return token
+
+            self.pos = start
+            if kind == 'SLOW':
+                return self._slow_token()
+            if self._refill():
+                continue
+            return Token(TOKEN_EOF, None, self.line, start + self.col_base + self.eof_bias)
+
+    def _refill_at(self, pos):
+        # Rewind to pos and try to read more source; used when a token may be cut off
+        self.pos = pos
+        return self._refill()
+
+# ==========================================
+# STREAM LEXER
+# ==========================================
+
+class StreamLexer(RegexLexer):
+    """RegexLexer that reads its source incrementally from a file object or mmap.
+
+    Only a window of the source is kept in memory. The window always ends on a
+    line boundary, so single-line tokens are never split; strings and comments
+    that run past it pull in more source as they are scanned.
+    """
+
+    def __init__(self, stream, chunk_size=65536, start_line=1, start_col=1):
+        super().__init__('', start_line, start_col)
+        # A string is read the same way, so this can stand in for any backend
+        self.stream = io.StringIO(stream) if isinstance(stream, str) else stream
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self._refill()
+        self.current_char = self.source[0] if self.source else None
+
+    def _read_chunk(self):
+        chunk = self.stream.read(self.chunk_size)
+        if chunk:
+            chunk += self.stream.readline()
+        if isinstance(chunk, (bytes, bytearray)):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = self.decoder.decode(chunk, final=not chunk).replace('\r\n', '\n')
+        return chunk
+
+    def _refill(self):
+        if self.stream is None:
+            return False
+        chunk = self._read_chunk()
+        if not chunk:
+            self.stream = None
+            return False
+
+        # Drop everything before the current position; columns stay relative to it
+        self.col_base += self.pos
+        self.source = self.source[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _slow_token(self):
+        if self.pos + 1 >= len(self.source):
+            self._refill()
+        return super()._slow_token()
+
+    def advance(self):
+        if self.pos + 1 >= len(self.source):
+            self._refill()
+        super().advance()
+
+    def peek(self):
+        if self.pos + 1 >= len(self.source):
+            self._refill()
+        return super().peek()
+
+# ==========================================
+# TOKEN STREAM
+# ==========================================
+
+RE_SPACE = re.compile(r'\s*')
+
+class TokenStream:
+    """Compact, array-backed token storage for a whole source string.
+
+    Type codes are kept in an array('B'), start offsets in an array('I') and
+    values in a side table. Line and column are not tracked while scanning;
+    they are resolved from a newline index when a Token is materialized.
+    """
+
+    def __init__(self, source_code):
+        self.source = source_code
+        self.types = array('B')
+        self.offsets = array('I')
+        self.values = []
+        self.newlines = None
+        self._scan()
+
+    def _scan(self):
+        source = self.source
+        add_type = self.types.append
+        add_offset = self.offsets.append
+        add_value = self.values.append
+        interned = {}
+        eof_bias = 0
+        fallback = None
+        # The classic Lexer tracks f-string interpolation depth; keep a handle on it
+        fstring_depths = ()
+        pos = 0
+
+        while True:
+            m = RE_MASTER.match(source, pos)
+            kind = m.lastgroup if m else 'SLOW'
+            start = m.start(kind) if m else RE_SPACE.match(source, pos).end()
+
+            if kind == 'OP':
+                text = m.group(kind)
+                if not ((text == '.' and source[start + 1:start + 2].isdigit()) or (fstring_depths and text in FSTRING_BRACES)):
+                    add_type(OPERATOR_TOKENS[text]); add_offset(start); add_value(interned.setdefault(text, text))
+                    pos = m.end()
+                    continue
+                kind = 'SLOW'
+
+            elif kind == 'ID':
+                text = m.group(kind)
+                if not (text == 'f' and source[start + 1:start + 2] == '"'):
+                    add_type(KEYWORD_TOKENS.get(text, TOKEN_ID)); add_offset(start); add_value(interned.setdefault(text, text))
+                    pos = m.end()
+                    continue
+                kind = 'SLOW'
+
+            if kind == 'INT':
+                add_type(TOKEN_INT); add_offset(start); add_value(int(m.group(kind)))
+                pos = m.end()
+
+            elif kind == 'FLOAT':
+                add_type(TOKEN_FLOAT); add_offset(start); add_value(float(m.group(kind)))
+                pos = m.end()
+
+            elif kind == 'STRING' or kind == 'CHAR':
+                add_type(TOKEN_STRING if kind == 'STRING' else TOKEN_CHAR); add_offset(start); add_value(m.group(kind)[1:-1])
+                pos = m.end()
+
+            elif kind == 'FSTRING':
+                add_type(TOKEN_FSTRING); add_offset(start); add_value(m.group(kind)[2:-1])
+                pos = m.end()
+
+            elif kind == 'COMMENT':
+                text = m.group(kind)
+                if text[1] == '~' and not text.endswith('\n'):
+                    # The classic Lexer steps one column past a '~~' comment that ends the file
+                    eof_bias = 1
+                pos = m.end()
+
+            elif kind == 'EOF':
+                add_type(TOKEN_EOF); add_offset(start + eof_bias); add_value(None)
+                return
+
+            else:
+                # Hand one token to the classic Lexer, with its position synced for error messages
+                if fallback is None:
+                    fallback = Lexer(source)
+                    fstring_depths = fallback.fstring_depths
+                fallback.pos = start
+                fallback.current_char = source[start] if start < len(source) else None
+                fallback.line, fallback.col = self.line_col(start)
+                token = fallback.get_next_token()
+                add_type(token.type); add_offset(start); add_value(token.value)
+                if token.type == TOKEN_EOF:
+                    return
+                pos = fallback.pos
+
+    def _newline_index(self):
+        if self.newlines is None:
+            source = self.source
+            newlines = array('I')
+            i = source.find('\n')
+            while i != -1:
+                newlines.append(i)
+                i = source.find('\n', i + 1)
+            self.newlines = newlines
+        return self.newlines
+
+    def line_col(self, offset):
+        newlines = self._newline_index()
+        count = bisect_left(newlines, offset)
+        return count + 1, offset - (newlines[count - 1] if count else -1)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        line, col = self.line_col(self.offsets[index])
+        return Token(self.types[index], self.values[index], line, col)
+
+    def __iter__(self):
+        # Walk the newline index alongside the tokens instead of bisecting per token
+        newlines = self._newline_index()
+        count = len(newlines)
+        k = 0
+        line_start = -1
+        for token_type, offset, value in zip(self.types, self.offsets, self.values):
+            while k < count and newlines[k] < offset:
+                line_start = newlines[k]
+                k += 1
+            yield Token(token_type, value, k + 1, offset - line_start)
+
+# ==========================================
+# LEXER BACKENDS
+# ==========================================
+
+LEXER_BACKENDS = {
+    'classic': Lexer,
+    'regex': RegexLexer,
+    'compact': TokenStream,
+    'stream': StreamLexer,
+}
+
+def get_lexer_class(backend='classic'):
+    if backend not in LEXER_BACKENDS:
+        raise lunite_error("Lexer", f"Unknown lexer backend '{backend}', expected one of: {', '.join(LEXER_BACKENDS)}")
+    return LEXER_BACKENDS[backend]
@@ -0,0 +1,430 @@
+# AST Optimizer
+# -------------
+
+import os
+from dataclasses import fields
+from functools import lru_cache
+
+from core.ast import *
+from core.lexer import Token
+import core.constants as constants
+
+# ==========================================
+# PASS FRAMEWORK
+# ==========================================
+
+# A pass is an AST -> AST transformer. visit_<Node> methods return the node
+# that replaces the one they were given; nodes without one have their children
+# visited in place. Passes run between the parser and either back-end, so
+# anything they produce must mean the same thing to the interpreter and LBVM.
+
+@lru_cache(maxsize=None)
+def child_fields(node_class):
+    return tuple(f.name for f in fields(node_class) if f.name not in ('line', 'col', 'inline_cache', 'binder'))
+
+def located(node, origin):
+    node.line = origin.line
+    node.col = origin.col
+    return node
+
+class ASTPass:
+    name = "pass"
+    level = 1
+
+    def run(self, node):
+        return self.visit(node)
+
+    def visit(self, node):
+        method = getattr(self, 'visit_' + node.__class__.__name__, None)
+        if method is None:
+            return self.generic_visit(node)
+        return method(node)
+
+    def generic_visit(self, node):
+        for name in child_fields(node.__class__):
+            value = getattr(node, name)
+            if isinstance(value, AST):
+                setattr(node, name, self.visit(value))
+            elif isinstance(value, (list, tuple)):
+                setattr(node, name, self.visit_items(value))
+        return node
+
+    def visit_items(self, items):
+        result = []
+        for item in items:
+            if isinstance(item, AST):
+                item = self.visit(item)
+            elif isinstance(item, (list, tuple)):
+                item = self.visit_items(item)
+            result.append(item)
+        return result if isinstance(items, list) else tuple(result)
+
+# ==========================================
+# LITERALS
+# ==========================================
+
+NO_VALUE = object()
+
+def literal_value(node):
+    cls = node.__class__
+    if cls is Number or cls is String:
+        return node.token.value
+    if cls is Boolean:
+        return node.value
+    if cls is Null:
+        return None
+    return NO_VALUE
+
+def make_literal(value, origin):
+    if value is None:
+        node = Null()
+    elif isinstance(value, bool):
+        node = Boolean(Token(TOKEN_KEYWORD, 'true' if value else 'false', origin.line, origin.col), value)
+    elif isinstance(value, str):
+        node = String(Token(TOKEN_STRING, value, origin.line, origin.col))
+    elif isinstance(value, float):
+        node = Number(Token(TOKEN_FLOAT, value, origin.line, origin.col))
+    else:
+        node = Number(Token(TOKEN_INT, value, origin.line, origin.col))
+    return located(node, origin)
+
+def is_number(value):
+    return value.__class__ is int or value.__class__ is float
+
+# ==========================================
+# PASSES
+# ==========================================
+
+class StringMerging(ASTPass):
+    # "a" + "b" becomes "ab", and literal text added to an f-string is moved
+    # into its parts so the whole chain is built by a single join
+    name = "string-merging"
+
+    def visit_BinaryOp(self, node):
+        self.generic_visit(node)
+        if node.op.type != TOKEN_PLUS:
+            return node
+
+        left, right = node.left, node.right
+        if left.__class__ is String and right.__class__ is String:
+            return make_literal(left.token.value + right.token.value, node)
+        if left.__class__ is FString and right.__class__ in (String, FString):
+            return located(FString(self.merge_parts(left.parts, self.parts_of(right))), left)
+        if left.__class__ is String and right.__class__ is FString:
+            return located(FString(self.merge_parts([left.token.value], right.parts)), left)
+        return node
+
+    def parts_of(self, node):
+        return [node.token.value] if node.__class__ is String else node.parts
+
+    def merge_parts(self, left, right):
+        parts = list(left)
+        for part in right:
+            if part.__class__ is str and parts and parts[-1].__class__ is str:
+                parts[-1] += part
+            else:
+                parts.append(part)
+        return parts
+
+class ConstantFolding(ASTPass):
+    # Only operations whose result is identical in both back-ends are folded;
+    # anything that would raise is left alone so the error still happens at
+    # run time with its usual message and position
+    name = "constant-folding"
+
+    ARITHMETIC = {
+        TOKEN_PLUS: lambda a, b: a + b,
+        TOKEN_MINUS: lambda a, b: a - b,
+        TOKEN_MUL: lambda a, b: a * b,
+        TOKEN_DIV: lambda a, b: a / b,
+    }
+    BITWISE = {
+        TOKEN_BIT_AND: lambda a, b: a & b,
+        TOKEN_BIT_OR: lambda a, b: a | b,
+        TOKEN_BIT_XOR: lambda a, b: a ^ b,
+        TOKEN_LSHIFT: lambda a, b: a << b,
+        TOKEN_RSHIFT: lambda a, b: a >> b,
+    }
+    ORDERING = {
+        TOKEN_GT: lambda a, b: a > b,
+        TOKEN_LT: lambda a, b: a < b,
+        TOKEN_GE: lambda a, b: a >= b,
+        TOKEN_LE: lambda a, b: a <= b,
+    }
+
+    def visit_UnaryOp(self, node):
+        node.expr = self.visit(node.expr)
+        value = literal_value(node.expr)
+        if value is NO_VALUE:
+            return node
+
+        op = node.op.type
+        if op == TOKEN_MINUS and is_number(value):
+            return make_literal(-value, node)
+        if op == TOKEN_NOT:
+            return make_literal(not value, node)
+        return node
+
+    def visit_BinaryOp(self, node):
+        op = node.op.type
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        left = literal_value(node.left)
+
+        # Mirrors the interpreter: `and` yields false or the right operand,
+        # `or` yields true or the right operand
+        if op == TOKEN_AND and left is not NO_VALUE:
+            return node.right if left else make_literal(False, node)
+        if op == TOKEN_OR and left is not NO_VALUE:
+            return make_literal(True, node) if left else node.right
+
+        right = literal_value(node.right)
+        if left is NO_VALUE or right is NO_VALUE:
+            return node
+
+        if op in self.ARITHMETIC and is_number(left) and is_number(right):
+            if op == TOKEN_DIV and right == 0:
+                return node
+            return make_literal(self.ARITHMETIC[op](left, right), node)
+        if op == TOKEN_MOD and is_number(left) and is_number(right):
+            # fmod and % only agree when neither operand is negative
+            if left < 0 or right <= 0:
+                return node
+            return make_literal(left % right, node)
+        if op in self.BITWISE and left.__class__ is int and right.__class__ is int:
+            if op in (TOKEN_LSHIFT, TOKEN_RSHIFT) and not 0 <= right < 64:
+                return node
+            return make_literal(self.BITWISE[op](left, right), node)
+        if op in self.ORDERING:
+            if (is_number(left) and is_number(right)) or (left.__class__ is str and right.__class__ is str):
+                return make_literal(self.ORDERING[op](left, right), node)
+            return node
+        if op == TOKEN_EQ:
+            return make_literal(left == right, node)
+        if op == TOKEN_NEQ:
+            return make_literal(left != right, node)
+        return node
+
+    def visit_TernaryOp(self, node):
+        self.generic_visit(node)
+        value = literal_value(node.condition)
+        if value is NO_VALUE:
+            return node
+        return node.true_expr if value else node.false_expr
+
+class DeadBranchElimination(ASTPass):
+    # if/while with a literal condition. A taken branch stays wrapped in an
+    # `if (true)` so it keeps its own scope; untaken ones are dropped
+    name = "dead-branch-elimination"
+
+    def visit_Block(self, node):
+        statements = []
+        last = len(node.statements) - 1
+        for i, stmt in enumerate(node.statements):
+            stmt = self.visit(stmt)
+            if stmt is None:
+                # The last statement's value is the value of the block
+                if i != last:
+                    continue
+                stmt = located(Null(), node.statements[i])
+            statements.append(stmt)
+        node.statements = statements
+        return node
+
+    def visit_IfStatement(self, node):
+        self.generic_visit(node)
+        value = literal_value(node.condition)
+        if value is NO_VALUE:
+            return node
+
+        taken = node.true_block if value else node.false_block
+        if taken is None:
+            return None
+        if value and node.false_block is None:
+            return node
+        return located(IfStatement(make_literal(True, node.condition), taken, None), node)
+
+    def visit_WhileStatement(self, node):
+        self.generic_visit(node)
+        value = literal_value(node.condition)
+        if value is not NO_VALUE and not value:
+            return None
+        return node
+
+# ==========================================
+# SCOPE ELISION
+# ==========================================
+
+def declared_names(node):
+    # The names a statement binds in the scope it runs in, and whether it
+    # binds them with `global`
+    cls = node.__class__
+    if cls is VarDecl or cls is FunctionDef or cls is ClassDef:
+        return [node.name], node.is_global
+    if cls is DestructuringDecl:
+        return node.names, node.is_global
+    if cls is AsyncFuncDef or cls is EnumDef:
+        return [node.name], False
+    if cls is DecoratedFunc:
+        return [node.function.name], getattr(node.function, 'is_global', False)
+    if cls is ImportStatement:
+        return [os.path.splitext(os.path.basename(node.module_name))[0]], False
+    if cls is ImportPyStatement:
+        return [node.alias], False
+    return (), False
+
+class BindingSurvey(ASTPass):
+    # Whether a block binds anything in the scope it runs in: a declaration
+    # of its own or in a match case, or a `global` one in any nested scope,
+    # since where that lands depends on the scopes above it. Also notes
+    # whether a function defined inside could capture the scope.
+    name = "binding-survey"
+
+    def __init__(self):
+        self.binds = False
+        self.captures = False
+        self.nested = 0
+
+    def survey(self, block):
+        self.visit_items(block.statements)
+        return self
+
+    def generic_visit(self, node):
+        names, is_global = declared_names(node)
+        if names and (is_global or not self.nested):
+            self.binds = True
+        cls = node.__class__
+        if cls is FunctionDef or cls is AsyncFuncDef:
+            self.captures = True
+        # Function, lambda and class bodies run in scopes of their own
+        if cls is FunctionDef or cls is AsyncFuncDef or cls is LambdaExpr or cls is ClassDef:
+            return node
+        return super().generic_visit(node)
+
+    def in_nested(self, *blocks):
+        self.nested += 1
+        for block in blocks:
+            if block is not None:
+                self.visit(block)
+        self.nested -= 1
+
+    def visit_IfStatement(self, node):
+        self.visit(node.condition)
+        self.in_nested(node.true_block, node.false_block)
+        return node
+
+    def visit_WhileStatement(self, node):
+        self.visit(node.condition)
+        self.in_nested(node.body)
+        return node
+
+    def visit_ForStatement(self, node):
+        self.visit(node.iterable)
+        self.in_nested(node.body)
+        return node
+
+    def visit_TryCatchStatement(self, node):
+        self.in_nested(node.try_block, node.catch_block, node.finally_block)
+        return node
+
+class ScopeElision(ASTPass):
+    # if/else branches, while bodies and attempt/finally blocks that bind
+    # nothing run in the enclosing scope instead of a new one. Loop bodies
+    # no function can capture get one scope for the whole loop, emptied
+    # between iterations, rather than one per iteration.
+    name = "scope-elision"
+
+    def mark(self, block):
+        survey = BindingSurvey().survey(block)
+        block.declares = survey.binds
+        return survey
+
+    def visit_IfStatement(self, node):
+        self.generic_visit(node)
+        self.mark(node.true_block)
+        if node.false_block:
+            self.mark(node.false_block)
+        return node
+
+    def visit_WhileStatement(self, node):
+        self.generic_visit(node)
+        node.reuse_scope = not self.mark(node.body).captures
+        return node
+
+    # A for body always holds the loop variable; `declares` only says
+    # whether it binds anything else
+    visit_ForStatement = visit_WhileStatement
+
+    def visit_TryCatchStatement(self, node):
+        self.generic_visit(node)
+        self.mark(node.try_block)
+        if node.finally_block:
+            self.mark(node.finally_block)
+        return node
+
+# ==========================================
+# TAIL CALLS
+# ==========================================
+
+class TailCalls(ASTPass):
+    # `return f(...)` inside f itself. The call binds its arguments where it
+    # stands and hands them back, and the frame already running f runs the
+    # body again in the new scope, so such recursion needs no Python stack.
+    # Calls inside attempt blocks are left alone, as finally must run after.
+    # Whether deep recursion overflows is behaviour rather than speed, so
+    # this pass runs at every level, -O0 included.
+    name = "tail-calls"
+    level = 0
+
+    def __init__(self):
+        self.function = None
+
+    def in_function(self, node, name):
+        outer, self.function = self.function, name
+        self.generic_visit(node)
+        self.function = outer
+        return node
+
+    def visit_FunctionDef(self, node):
+        return self.in_function(node, node.name)
+
+    def visit_AsyncFuncDef(self, node):
+        return self.in_function(node, None)
+
+    visit_LambdaExpr = visit_ClassDef = visit_TryCatchStatement = visit_AsyncFuncDef
+
+    def visit_ReturnStatement(self, node):
+        self.generic_visit(node)
+        value = node.value
+        if value.__class__ is FunctionCall and value.name == self.function:
+            value.tail_call = True
+        return node
+
+# ==========================================
+# PIPELINE
+# ==========================================
+
+# Passes run in this order, each only when the optimisation level is at
+# least its own. Strings are merged first so folding can compare the result.
+OPTIMIZATION_PASSES = [
+    StringMerging,
+    ConstantFolding,
+    DeadBranchElimination,
+    ScopeElision,
+    TailCalls,
+]
+
+def register_pass(pass_class, before=None):
+    if before is None:
+        OPTIMIZATION_PASSES.append(pass_class)
+    else:
+        OPTIMIZATION_PASSES.insert(OPTIMIZATION_PASSES.index(before), pass_class)
+    return pass_class
+
+def optimize(ast, level=None):
+    if level is None:
+        level = constants.OPT_LEVEL
+    for pass_class in OPTIMIZATION_PASSES:
+        if level >= pass_class.level:
+            ast = pass_class().run(ast)
+    return ast
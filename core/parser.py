@@ -1,29 +1,70 @@
 # Parser
 # ------
 
+from collections import deque
+
 from core.constants import *
 from core.errors import *
 from core.ast import *
 
+# ==========================================
+# OPERATOR PRECEDENCE
+# ==========================================
+
+PREC_LOGIC   = 1
+PREC_COMP    = 2
+PREC_BIT_OR  = 3
+PREC_BIT_XOR = 4
+PREC_BIT_AND = 5
+PREC_SHIFT   = 6
+PREC_MATH    = 7
+PREC_TERM    = 8
+
+# Binding power of each binary operator, higher binds tighter. Equality and
+# ordering comparisons share the additive level, so `a + b == c` is `(a + b) == c`
+# but `a << b == c` is `a << (b == c)`.
+BINARY_PRECEDENCE = {
+    TOKEN_AND: PREC_LOGIC,     TOKEN_OR: PREC_LOGIC,
+    TOKEN_IS: PREC_COMP,
+    TOKEN_BIT_OR: PREC_BIT_OR,
+    TOKEN_BIT_XOR: PREC_BIT_XOR,
+    TOKEN_BIT_AND: PREC_BIT_AND,
+    TOKEN_LSHIFT: PREC_SHIFT,  TOKEN_RSHIFT: PREC_SHIFT,
+    TOKEN_PLUS: PREC_MATH,     TOKEN_MINUS: PREC_MATH,
+    TOKEN_EQ: PREC_MATH,       TOKEN_NEQ: PREC_MATH,
+    TOKEN_GT: PREC_MATH,       TOKEN_LT: PREC_MATH,
+    TOKEN_GE: PREC_MATH,       TOKEN_LE: PREC_MATH,
+    TOKEN_MUL: PREC_TERM,      TOKEN_DIV: PREC_TERM,      TOKEN_MOD: PREC_TERM,
+}
+
+# Keywords that act as binary operators
+KEYWORD_PRECEDENCE = {
+    'in': PREC_COMP,
+}
+
 # ==========================================
 # PARSER
 # ==========================================
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = list(tokens) if not isinstance(tokens, list) else tokens
+        # Tokens are pulled lazily; only the ones after current_token that
+        # have been looked at are buffered, so a streaming Lexer stays streaming
+        self.token_source = iter(tokens)
+        self.lookahead = deque()
         self.pos = 0
-        self.current_token = self.tokens[self.pos]
-    
-    def _advance_loc(self, line, col, text):
-        for char in text:
-            if char == '\n':
-                line += 1
-                col = 1
-            else:
-                col += 1
-        return line, col
+        self.current_token = next(self.token_source)
 
+    def token_at(self, offset):
+        if offset == 0:
+            return self.current_token
+        while len(self.lookahead) < offset:
+            token = next(self.token_source, None)
+            if token is None:
+                return None
+            self.lookahead.append(token)
+        return self.lookahead[offset - 1]
+    
     def _unescape_fstring_part(self, text, line, col):
         s = ""
         i = 0
@@ -59,21 +100,18 @@ class Parser:
         return s
 
     def is_case_start(self):
-        if self.pos >= len(self.tokens):
-            return False
-            
-        i = self.pos
-        tok = self.tokens[i]
+        tok = self.current_token
         
         valid_start = tok.type in (TOKEN_INT, TOKEN_FLOAT, TOKEN_STRING, TOKEN_CHAR, TOKEN_ID, TOKEN_KEYWORD, TOKEN_LBRACKET, TOKEN_LBRACE, TOKEN_MINUS)
         if not valid_start:
             return False
         
-        if i + 1 < len(self.tokens) and self.tokens[i+1].type == TOKEN_COLON:
+        next_tok = self.token_at(1)
+        if next_tok is not None and next_tok.type == TOKEN_COLON:
             return True
             
-        if tok.type == TOKEN_ID and i + 3 < len(self.tokens):
-            if self.tokens[i+1].type == TOKEN_DOT and self.tokens[i+2].type == TOKEN_ID and self.tokens[i+3].type == TOKEN_COLON:
+        if tok.type == TOKEN_ID and self.token_at(3) is not None:
+            if self.token_at(1).type == TOKEN_DOT and self.token_at(2).type == TOKEN_ID and self.token_at(3).type == TOKEN_COLON:
                 return True
         
         return False
@@ -82,14 +120,17 @@ class Parser:
         token = self.current_token
         if self.current_token.type == token_type:
             self.pos += 1
-            if self.pos < len(self.tokens):
-                self.current_token = self.tokens[self.pos]
+            if self.lookahead:
+                self.current_token = self.lookahead.popleft()
+            else:
+                self.current_token = next(self.token_source, self.current_token)
         else:
-            raise lunite_error("Syntax", f"Unexpected token {self.current_token.type}, expected {token_type}", token.line, token.col)
+            raise lunite_error("Syntax", f"Unexpected token {TOKEN_NAMES[self.current_token.type]}, expected {TOKEN_NAMES[token_type]}", token.line, token.col)
 
     def peek(self):
-        if self.pos + 1 < len(self.tokens):
-            return self.tokens[self.pos + 1]
+        token = self.token_at(1)
+        if token is not None:
+            return token
         return self.current_token
     
     def parse_args(self):
@@ -152,89 +193,46 @@ class Parser:
         elif token.type == TOKEN_FSTRING:
             self.eat(TOKEN_FSTRING)
             
-            raw_val = token.value
-            if not raw_val:
+            if not token.value:
                 return String(Token(TOKEN_STRING, "", token.line, token.col))
             
-            parts = []
-            current_str = ""
-            depth = 0
-            expr_buffer = ""
+            node = FString([self._unescape_fstring_part(token.value, token.line, token.col + 2)])
+            node.line = token.line
+            node.col = token.col
+            return node
+        
+        elif token.type == TOKEN_FSTRING_START:
+            self.eat(TOKEN_FSTRING_START)
             
-            i = 0
-            while i < len(raw_val):
-                char = raw_val[i]
+            node = FString([])
+            node.line = token.line
+            node.col = token.col
+            if token.value:
+                node.parts.append(self._unescape_fstring_part(token.value, token.line, token.col + 2))
+            
+            # The lexer has already split the f-string: each interpolation's tokens
+            # run up to the FSTRING_MIDDLE or FSTRING_END that carries the next text
+            while True:
+                node.parts.append(self.expr())
                 
-                if char == '{':
-                    if depth == 0:
-                        if current_str:
-                            parts.append(("str", current_str))
-                            current_str = ""
-                        depth = 1
-                    else:
-                        expr_buffer += char
+                depth = 0
+                while True:
+                    part = self.current_token
+                    if part.type == TOKEN_EOF:
+                        raise lunite_error("Syntax", "Unterminated f-string", token.line, token.col)
+                    if depth == 0 and (part.type == TOKEN_FSTRING_MIDDLE or part.type == TOKEN_FSTRING_END):
+                        break
+                    if part.type == TOKEN_FSTRING_START:
                         depth += 1
-                elif char == '}':
-                    depth -= 1
-                    if depth == 0:
-                        parts.append(("expr", expr_buffer))
-                        expr_buffer = ""
-                    else:
-                        expr_buffer += char
-                else:
-                    if depth > 0:
-                        expr_buffer += char
-                    else:
-                        current_str += char
-                i += 1
-            
-            if current_str:
-                parts.append(("str", current_str))
-
-            curr_line = token.line
-            curr_col = token.col + 2
-            
-            root = String(Token(TOKEN_STRING, "", token.line, token.col))
-            root.line = token.line
-            root.col = token.col
-            
-            for p_type, p_val in parts:
-                if p_type == "str":
-                    unescaped = self._unescape_fstring_part(p_val, curr_line, curr_col)
-                    lit = String(Token(TOKEN_STRING, unescaped, curr_line, curr_col))
-                    lit.line = curr_line
-                    lit.col = curr_col
-                    
-                    add_op = Token(TOKEN_PLUS, '+', curr_line, curr_col)
-                    root = BinaryOp(root, add_op, lit)
-                    root.line = curr_line
-                    root.col = curr_col
-                    
-                    curr_line, curr_col = self._advance_loc(curr_line, curr_col, p_val)
-                    
-                elif p_type == "expr":
-                    sub_lexer = Lexer(p_val, start_line=curr_line, start_col=curr_col + 1)
-                    sub_tokens = []
-                    while True:
-                        t = sub_lexer.get_next_token()
-                        sub_tokens.append(t)
-                        if t.type == TOKEN_EOF: break
-                    
-                    sub_parser = Parser(sub_tokens)
-                    sub_expr = sub_parser.expr()
-                    
-                    str_call = FunctionCall('str', [sub_expr])
-                    str_call.line = curr_line
-                    str_call.col = curr_col
-                    
-                    add_op = Token(TOKEN_PLUS, '+', curr_line, curr_col)
-                    root = BinaryOp(root, add_op, str_call)
-                    root.line = curr_line
-                    root.col = curr_col
-                    
-                    curr_line, curr_col = self._advance_loc(curr_line, curr_col, "{" + p_val + "}")
-
-            return root
+                    elif part.type == TOKEN_FSTRING_END:
+                        depth -= 1
+                    self.eat(part.type)
+                self.eat(part.type)
+                
+                if part.value:
+                    node.parts.append(self._unescape_fstring_part(part.value, part.line, part.col + 1))
+                if part.type == TOKEN_FSTRING_END:
+                    return node
         
         elif token.type == TOKEN_STRING:
             self.eat(TOKEN_STRING)
@@ -435,6 +433,9 @@ class Parser:
             node.col = token.col
             return node
         
+        if token.type == TOKEN_FSTRING_MIDDLE or token.type == TOKEN_FSTRING_END:
+            raise lunite_error("Syntax", "Expected an expression before '}' in f-string", token.line, token.col)
+        
         raise lunite_error("Syntax", f"Invalid atom '{token.value}'", token.line, token.col)
 
     def factor(self):
@@ -513,104 +514,34 @@ class Parser:
 
         return node
 
-    def term(self):
+    def binary_expr(self, min_prec=PREC_LOGIC):
+        # Precedence climbing over BINARY_PRECEDENCE; every level is left-associative
         node = self.factor()
-        while self.current_token.type in (TOKEN_MUL, TOKEN_DIV, TOKEN_MOD):
+        while True:
             token = self.current_token
-            self.eat(token.type)
-            node = BinaryOp(left=node, op=token, right=self.factor())
-            node.line = token.line
-            node.col = token.col
-        return node
-    
-    def math_expr(self):
-        node = self.term()
-        while self.current_token.type in (TOKEN_PLUS, TOKEN_MINUS, TOKEN_EQ, TOKEN_NEQ, TOKEN_GT, TOKEN_LT, TOKEN_GE, TOKEN_LE):
-            token = self.current_token
-            self.eat(token.type)
-            node = BinaryOp(left=node, op=token, right=self.term())
-            node.line = token.line
-            node.col = token.col
-        return node
-    
-    def shift_expr(self):
-        node = self.math_expr()
-        while self.current_token.type in (TOKEN_LSHIFT, TOKEN_RSHIFT):
-            token = self.current_token
-            self.eat(token.type)
-            node = BinaryOp(left=node, op=token, right=self.math_expr())
-            node.line = token.line
-            node.col = token.col
-        return node
-    
-    def bitwise_and_expr(self):
-        node = self.shift_expr()
-        while self.current_token.type == TOKEN_BIT_AND:
-            token = self.current_token
-            self.eat(TOKEN_BIT_AND)
-            node = BinaryOp(left=node, op=token, right=self.shift_expr())
-            node.line = token.line
-            node.col = token.col
-        return node
-
-    def bitwise_xor_expr(self):
-        node = self.bitwise_and_expr()
-        while self.current_token.type == TOKEN_BIT_XOR:
-            token = self.current_token
-            self.eat(TOKEN_BIT_XOR)
-            node = BinaryOp(left=node, op=token, right=self.bitwise_and_expr())
-            node.line = token.line
-            node.col = token.col
-        return node
-
-    def bitwise_or_expr(self):
-        node = self.bitwise_xor_expr()
-        while self.current_token.type == TOKEN_BIT_OR:
-            token = self.current_token
-            self.eat(TOKEN_BIT_OR)
-            node = BinaryOp(left=node, op=token, right=self.bitwise_xor_expr())
-            node.line = token.line
-            node.col = token.col
-        return node
-    
-    def comp_expr(self):
-        node = self.bitwise_or_expr()
-        while self.current_token.type in (TOKEN_EQ, TOKEN_NEQ, TOKEN_GT, TOKEN_LT, TOKEN_LE, TOKEN_GE, TOKEN_IS, TOKEN_KEYWORD):
-            token = self.current_token
-            if token.type == TOKEN_KEYWORD and token.value == 'in':
-                self.eat(TOKEN_KEYWORD)
-                right = self.bitwise_or_expr()
-                node = BinaryOp(left=node, op=token, right=right) 
-                node.line = token.line
-                node.col = token.col
-                continue
-            if token.type == TOKEN_KEYWORD and token.value != 'in':
+            prec = BINARY_PRECEDENCE.get(token.type)
+            if prec is None:
+                if token.type != TOKEN_KEYWORD:
+                    break
+                prec = KEYWORD_PRECEDENCE.get(token.value)
+                if prec is None:
+                    break
+            if prec < min_prec:
                 break
+
             self.eat(token.type)
+            right = self.binary_expr(prec + 1)
             if token.type == TOKEN_IS:
-                target = self.bitwise_or_expr()
-                node = TypeCheckOp(node, target)
-                node.line = token.line
-                node.col = token.col
+                node = TypeCheckOp(node, right)
             else:
-                node = BinaryOp(left=node, op=token, right=self.bitwise_or_expr())
-                node.line = token.line
-                node.col = token.col
-        return node
-
-    def logic_expr(self):
-        node = self.comp_expr()
-        while self.current_token.type in (TOKEN_AND, TOKEN_OR):
-            token = self.current_token
-            self.eat(token.type)
-            node = BinaryOp(left=node, op=token, right=self.comp_expr())
+                node = BinaryOp(left=node, op=token, right=right)
             node.line = token.line
             node.col = token.col
         return node
 
     def expr(self):
         token = self.current_token
-        node = self.logic_expr()
+        node = self.binary_expr()
         
         if self.current_token.type == TOKEN_QUESTION:
             self.eat(TOKEN_QUESTION)
@@ -1026,10 +957,9 @@ class Parser:
             return node
     
         elif token.type == TOKEN_LBRACE:
-            if (self.pos + 1 < len(self.tokens) and 
-                self.tokens[self.pos+1].type == TOKEN_ID and 
-                self.pos + 2 < len(self.tokens) and 
-                self.tokens[self.pos+2].type == TOKEN_RBRACE):
+            if (self.token_at(2) is not None and 
+                self.token_at(1).type == TOKEN_ID and 
+                self.token_at(2).type == TOKEN_RBRACE):
                 
                 self.eat(TOKEN_LBRACE)
                 name = self.current_token.value
@@ -1,37 +1,131 @@
 import re
+from functools import lru_cache
+
+# String literals and comments are matched first so macros are never
+# defined or expanded inside them. An f-string is matched only by its
+# opening f"; where it ends and which parts of it are code are worked out
+# by fstring_end and fstring_spans, the way the lexer and parser read it
+SKIP_PATTERN = r'''(?P<fstring>\bf")|"(?:[^"\\]|\\[\s\S])*(?:"|\Z)|'(?:[^'\\]|\\[\s\S])*(?:'|\Z)|~~[^\n]*|~\*[\s\S]*?(?:\*~|\Z)'''
+
+RE_DEFINITIONS = re.compile(
+    rf'(?P<skip>{SKIP_PATTERN})'
+    r'|macro\s+(?P<name>[a-zA-Z_]\w*)\s*(?:\((?P<params>.*?)\))?\s*(?:\{(?P<block>[\s\S]*?)\}|=\s*(?P<expr>.*))'
+)
+
+@lru_cache(maxsize=32)
+def expansion_pattern(signature):
+    # One alternation over every macro of a given macro set, compiled once per set
+    names = sorted(signature, key=lambda item: len(item[0]), reverse=True)
+    calls = '|'.join(re.escape(name) for name, has_params in names if has_params)
+    plain = '|'.join(re.escape(name) for name, has_params in names if not has_params)
+
+    parts = [rf'(?P<skip>{SKIP_PATTERN})']
+    if calls:
+        parts.append(rf'\b(?P<call>{calls})\s*\((?P<args>.*?)\)')
+    if plain:
+        parts.append(rf'\b(?P<plain>{plain})\b')
+    return re.compile('|'.join(parts))
+
+def fstring_end(text, pos):
+    # pos is just past the opening f". As in Lexer.make_fstring, a quote only
+    # closes the literal outside {...}, and a backslash escapes the next char
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char == '\\':
+            pos += 2
+            continue
+        if char == '"' and depth == 0:
+            return pos + 1
+        if char == '{':
+            depth += 1
+        elif char == '}' and depth > 0:
+            depth -= 1
+        pos += 1
+    return len(text)
+
+def fstring_spans(body):
+    # (start, end) of each top-level {...} interpolation, split as the parser does
+    spans = []
+    depth = 0
+    for i, char in enumerate(body):
+        if char == '{':
+            if depth == 0:
+                start = i + 1
+            depth += 1
+        elif char == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i))
+    return spans
+
+def substitute(pattern, text, replace, fstring):
+    # pattern.sub, except that each f-string is handed whole to fstring()
+    out = []
+    pos = 0
+    match = pattern.search(text)
+    while match is not None:
+        out.append(text[pos:match.start()])
+        if match.group('fstring') is not None:
+            pos = fstring_end(text, match.end())
+            out.append(fstring(text[match.start():pos]))
+        else:
+            pos = match.end()
+            out.append(replace(match))
+        match = pattern.search(text, pos)
+    out.append(text[pos:])
+    return ''.join(out)
 
 class Preprocessor:
     def __init__(self):
         self.macros = {}
 
     def process(self, source: str) -> str:
-        macro_regex = re.compile(r'macro\s+([a-zA-Z_]\w*)\s*(?:\((.*?)\))?\s*(?:\{([\s\S]*?)\}|=\s*(.*))')
-        
         def make_macro(match):
-            name = match.group(1)
-            params = [p.strip() for p in match.group(2).split(',')] if match.group(2) else []
-            body = match.group(3) if match.group(3) else match.group(4)
+            if match.group('skip') is not None:
+                return match.group(0)
+            name = match.group('name')
+            params = [p.strip() for p in match.group('params').split(',')] if match.group('params') else []
+            body = match.group('block') if match.group('block') else match.group('expr')
             self.macros[name] = (params, body.strip())
             return ""
 
-        clean_source = macro_regex.sub(make_macro, source)
+        clean_source = substitute(RE_DEFINITIONS, source, make_macro, lambda literal: literal)
+        if not self.macros:
+            return clean_source
+
+        signature = frozenset((name, bool(params)) for name, (params, _) in self.macros.items())
+        return self.expand(clean_source, expansion_pattern(signature), frozenset())
+
+    def expand(self, text, pattern, active):
+        # Expansions are rescanned for other macros, but never for the one being expanded
+        def replace(match):
+            groups = match.groupdict()
+            name = groups.get('plain') or groups.get('call')
+            if name is None or name in active:
+                return match.group(0)
 
-        for name in sorted(self.macros.keys(), key=len, reverse=True):
             params, body = self.macros[name]
-            
-            if not params:
-                clean_source = re.sub(rf'\b{name}\b', body, clean_source)
-            else:
-                param_pattern = rf'\b{name}\s*\((.*?)\)'
-                
-                def replace_func_macro(m):
-                    args = [a.strip() for a in m.group(1).split(',')]
-                    temp_body = body
-                    for i, p_name in enumerate(params):
-                        if i < len(args):
-                            temp_body = temp_body.replace(p_name, f"({args[i]})")
-                    return temp_body
-
-                clean_source = re.sub(param_pattern, replace_func_macro, clean_source)
-
-        return clean_source
\ No newline at end of file
+            if params:
+                args = [a.strip() for a in match.group('args').split(',')]
+                for i, p_name in enumerate(params):
+                    if i < len(args):
+                        body = body.replace(p_name, f"({args[i]})")
+            return self.expand(body, pattern, active | {name})
+
+        def fstring(literal):
+            # The literal text is left alone; each {...} is code and is expanded
+            closed = len(literal) > 2 and literal.endswith('"') and fstring_end(literal, 2) == len(literal)
+            body = literal[2:-1] if closed else literal[2:]
+            out = [literal[:2]]
+            pos = 0
+            for start, end in fstring_spans(body):
+                out.append(body[pos:start])
+                out.append(self.expand(body[start:end], pattern, active))
+                pos = end
+            out.append(body[pos:])
+            if closed:
+                out.append('"')
+            return ''.join(out)
+
+        return substitute(pattern, text, replace, fstring)
@@ -35,24 +35,87 @@ class LChar(str):
 # LUNITE INSTANCE
 # ==========================================
 
+# Instances keep their field values in a list. The shape they point to maps
+# each field name to its index, and is shared by every instance that gained
+# the same fields in the same order. Adding a field moves the instance to the
+# next shape along, which is created the first time and reused after that.
+#
+# Past MAX_SHAPE_FIELDS an instance switches to dictionary mode: it gets a
+# shape of its own, without transitions, whose slots grow in place. Modules,
+# enums and static libraries with many fields then cost one dict, not a copy
+# of it per field kept alive in the transition tree.
+
+MAX_SHAPE_FIELDS = 32
+
+class Shape:
+    __slots__ = ('slots', 'transitions')
+
+    def __init__(self, slots, shared=True):
+        self.slots = slots
+        self.transitions = {} if shared else None
+
+    def with_field(self, name):
+        transitions = self.transitions
+        if transitions is None:
+            # Dictionary mode; indices are only ever appended, so inline
+            # caches that hold this shape stay valid
+            self.slots[name] = len(self.slots)
+            return self
+        shape = transitions.get(name)
+        if shape is None:
+            slots = dict(self.slots)
+            slots[name] = len(slots)
+            if len(slots) > MAX_SHAPE_FIELDS:
+                return Shape(slots, shared=False)
+            shape = transitions[name] = Shape(slots)
+        return shape
+
+EMPTY_SHAPE = Shape({})
+
 class LuniteInstance:
-    def __init__(self, mold_node):
+    __slots__ = ('mold', 'shape', 'values', 'methods', 'constants')
+
+    def __init__(self, mold_node, methods=None):
         self.mold = mold_node
-        self.fields = {}
-        self.constants = set()
-        self.methods = {}
-    
+        self.shape = EMPTY_SHAPE
+        self.values = []
+        # For instances made by `new` this is the class table's read-only
+        # view, shared by all of them; set_method() copies it on first write
+        self.methods = {} if methods is None else methods
+        self.constants = None
+
     def get(self, name, line, col):
-        if name in self.fields:
-            return self.fields[name]
+        i = self.shape.slots.get(name)
+        if i is not None:
+            return self.values[i]
         if name in self.methods:
             return self.methods[name]
         raise lunite_error("Runtime", f"Class '{self.mold.name}' does not contain the property '{name}'", line, col)
 
+    def get_field(self, name, default=None):
+        i = self.shape.slots.get(name)
+        return default if i is None else self.values[i]
+
     def set(self, name, val):
-        if name in self.constants:
+        if self.constants is not None and name in self.constants:
             raise Exception(f"Cannot reassign read-only property '{name}'")
-        self.fields[name] = val
+        i = self.shape.slots.get(name)
+        if i is None:
+            self.shape = self.shape.with_field(name)
+            self.values.append(val)
+        else:
+            self.values[i] = val
+
+    def set_method(self, name, func):
+        methods = self.methods
+        if methods.__class__ is not dict:
+            methods = self.methods = dict(methods)
+        methods[name] = func
+
+    def make_constant(self, name):
+        if self.constants is None:
+            self.constants = set()
+        self.constants.add(name)
 
     def __repr__(self):
         return f"<Instance of {self.mold.name}>"
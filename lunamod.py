@@ -10,6 +10,8 @@ import os
 from core.lexer import Lexer
 from core.parser import Parser
 from runtime.interpreter import Interpreter
+from core.cache import load_ast, store_ast
+from core.optimizer import optimize
 import core.constants as constants
 
 __all__ = ["import_module", "import_", "load", "from_import", "LunaModule"]
@@ -98,7 +100,6 @@ def _compile_mod(module_path):
     if module_path in _loaded_modules:
         return _loaded_modules[module_path]
 
-    source = _read_source(module_path)
     interpreter = Interpreter()
     interpreter.global_env = interpreter.global_env
 
@@ -107,12 +108,14 @@ def _compile_mod(module_path):
     old_file = constants.CURRENT_FILE
     try:
         constants.CURRENT_FILE = module_path
-        lexer = Lexer(source)
-        tokens = list(lexer)
-
-        parser = Parser(tokens)
-        ast = parser.parse()
-        interpreter.visit(ast)
+        ast = load_ast(module_path, preprocessed=False)
+        if ast is None:
+            source = _read_source(module_path)
+            lexer = Lexer(source)
+            parser = Parser(lexer)
+            ast = parser.parse()
+            store_ast(module_path, ast, preprocessed=False)
+        interpreter.execute(optimize(ast))
     finally:
         constants.CURRENT_FILE = old_file
 
@@ -9,6 +9,7 @@ import shutil
 import platform
 import subprocess
 import uuid
+import mmap
 try:
     from colorama import init, Fore, Style
     init(autoreset=True)
@@ -26,9 +27,13 @@ from core.lexer import *
 from core.parser import *
 from core.lbvm import *
 from core.preprocessor import *
+from core.cache import *
+from core.optimizer import optimize
 
 from runtime.interpreter import *
+from runtime.closures import *
 from runtime.environment import *
+from runtime.profiler import *
 
 # ==========================================
 # VENV DETECTION AND PYTHON PATH
@@ -61,38 +66,80 @@ def get_python_venv():
 # CLI & BUILDER
 # ==========================================
 
-def run_code(source, debug=False, sandbox=False):
-    try:
-        preprocessor = Preprocessor()
-        source = preprocessor.process(source)
+def parse_tokens(tokens, debug=False):
+    if debug and not isinstance(tokens, TokenStream):
+        tokens = list(tokens)
+
+    parser = Parser(tokens)
+    ast = parser.parse()
 
-        lexer = Lexer(source)
-        tokens = list(lexer)
+    if debug:
+        print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} Tokens:")
+        for tok in tokens:
+            print(f"  {TOKEN_NAMES[tok.type]} {tok.value!r} ({tok.line}:{tok.col})")
+    return ast
+
+def run_tokens(tokens, debug=False, sandbox=False, cache_for=None, preprocessed=True):
+    try:
+        ast = parse_tokens(tokens, debug=debug)
+    except Exception as e:
+        print(str(e))
+        return
 
-        parser = Parser(tokens)
-        ast = parser.parse()
+    if cache_for is not None:
+        store_ast(cache_for, ast, preprocessed)
+    run_ast(ast, debug=debug, sandbox=sandbox)
 
+def run_ast(ast, debug=False, sandbox=False):
+    interpreter = None
+    try:
+        ast = optimize(ast)
         if debug:
-            print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} Tokens:")
-            for tok in tokens:
-                print(f"  {tok.type} {tok.value!r} ({tok.line}:{tok.col})")
-            print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} AST:")
+            print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} AST (optimisation level {constants.OPT_LEVEL}):")
             print(ast)
 
-        interpreter = Interpreter(safe_mode=sandbox, debug=debug)
-        interpreter.visit(ast)
+        interpreter = get_interpreter_class(constants.ENGINE)(safe_mode=sandbox, debug=debug)
+        interpreter.execute(ast)
 
     except (LeapException, BreakException, AdvanceException, ReturnException) as e:
         print(f"{Fore.RED}Runtime Error: Control flow error ({type(e).__name__}){Style.RESET_ALL}")
     except Exception as e:
         print(str(e))
 
+    if debug and interpreter is not None:
+        stats = interpreter.inline_cache_stats
+        lookups = stats['hits'] + stats['misses']
+        rate = stats['hits'] / lookups * 100 if lookups else 0.0
+        print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} Inline caches: {stats['hits']} hits, {stats['misses']} misses ({rate:.1f}% hit rate)")
+
+def run_code(source, debug=False, sandbox=False, lexer_backend="classic", cache_for=None):
+    try:
+        preprocessor = Preprocessor()
+        source = preprocessor.process(source)
+        lexer = get_lexer_class(lexer_backend)(source)
+    except Exception as e:
+        print(str(e))
+        return
+
+    run_tokens(lexer, debug=debug, sandbox=sandbox, cache_for=cache_for)
+
+def run_stream(stream, debug=False, sandbox=False, cache_for=None):
+    # Lexes straight from a file object or mmap; macros are not expanded,
+    # since that would need the whole source in memory
+    try:
+        lexer = StreamLexer(stream)
+    except Exception as e:
+        print(str(e))
+        return
+
+    run_tokens(lexer, debug=debug, sandbox=sandbox, cache_for=cache_for, preprocessed=False)
+
 def start_repl():
     constants.CURRENT_FILE = "REPL"
     print(f"{Fore.CYAN}Lunite {LUNITE_VERSION_STR} REPL CLI{Style.RESET_ALL}")
     print(f"{Fore.YELLOW}{COPYRIGHT}{Style.RESET_ALL}")
     
-    interpreter = Interpreter()
+    interpreter = get_interpreter_class(constants.ENGINE)()
     preprocessor = Preprocessor()
     buffer = []
     prompt_main = f"{Fore.GREEN}lunite>{Style.RESET_ALL} "
@@ -119,9 +166,14 @@ def start_repl():
                 print("  compile <file.luna>       --> compile code to .lunac")
                 print("  sandbox <file.luna/lunac> --> run code in a safe environment")
                 print("  debug <file.luna/lunac>   --> run code with debug output")
+                print("  profile <file.luna>       --> run code and report time per function and line")
                 print("  build <file.lunac>        --> bind and compile code into an executable")
                 print("  clean                     --> deletes build directories")
                 print("  version                   --> display version information")
+                print("  -O<level>                 --> AST optimisation level for run/compile (0 disables all but tail calls, default 1)")
+                print("  --engine=<name>           --> tree-walking engine: visitor (default) or closure")
+                print("  --lexer=<name>            --> lexer backend: classic (default), regex, compact or stream")
+                print("                               (stream reads files as it lexes them, without expanding macros)")
                 print()
                 print("Visit for more info:")
                 print("  https://github.com/SubhrajitSain/Lunite")
@@ -146,12 +198,11 @@ def start_repl():
             try:
                 text = preprocessor.process(source)
                 lexer = Lexer(text)
-                tokens = list(lexer)
-                ast = Parser(tokens).parse()
+                ast = optimize(Parser(lexer).parse())
 
                 if isinstance(ast, Block):
                     for stmt in ast.statements:
-                        res = interpreter.visit(stmt)
+                        res = interpreter.execute(stmt)
                         if res is not None:
                             print(interpreter.global_env.values.get('str')(res))
                 buffer = []
@@ -249,7 +300,8 @@ if __name__ == "__main__":
             os.remove(spec)
         shutil.rmtree("__pycache__", ignore_errors=True)
 
-def compile_to_bytecode(filename):
+def compile_to_bytecode(filename, lexer_backend=None):
+    lexer_backend = lexer_backend or constants.LEXER
     if not filename.lower().endswith('.luna'):
         raise ValueError(f"Compile: Not a .luna source file: '{filename}'")
 
@@ -262,7 +314,7 @@ def compile_to_bytecode(filename):
     source = preprocessor.process(source)
 
     bytecode_path = filename[:-5] + '.lunac'
-    save_bytecode(bytecode_path, source, source_file=os.path.abspath(filename))
+    save_bytecode(bytecode_path, source, source_file=os.path.abspath(filename), lexer_backend=lexer_backend)
     print(f"Compile: Compiled to bytecode file: '{bytecode_path}'")
     return bytecode_path
 
@@ -274,7 +326,8 @@ def _print_header():
     print("-------------------------------")
 
 
-def run_file_path(path, debug=False, sandbox=False):
+def run_file_path(path, debug=False, sandbox=False, lexer_backend=None):
+    lexer_backend = lexer_backend or constants.LEXER
     if path.lower().endswith('.lunac') and os.path.exists(path):
         run_bytecode(path, debug=debug, sandbox=sandbox)
         return
@@ -282,17 +335,67 @@ def run_file_path(path, debug=False, sandbox=False):
     if not os.path.exists(path):
         raise FileNotFoundError(f"Run: File not found: {path}")
 
+    constants.CURRENT_FILE = os.path.abspath(path)
+
+    # The stream backend skips the preprocessor, so it has cache entries of its own
+    preprocessed = lexer_backend != 'stream'
+    ast = load_ast(path, preprocessed)
+    if ast is not None:
+        if debug:
+            print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} Tokens: skipped, AST loaded from {cache_file_for(path, preprocessed)}")
+        run_ast(ast, debug=debug, sandbox=sandbox)
+        return
+
+    # The stream backend lexes the file from an mmap instead of reading it
+    # into memory in one piece, and so runs it without the preprocessor
+    if lexer_backend == 'stream' and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            run_stream(mm, debug=debug, sandbox=sandbox, cache_for=path)
+        return
+
     with open(path, 'r', encoding='utf-8') as f:
         source = f.read()
 
+    run_code(source, debug=debug, sandbox=sandbox, lexer_backend=lexer_backend, cache_for=path)
+
+
+def profile_file_path(path, lexer_backend=None):
+    lexer_backend = lexer_backend or constants.LEXER
+    if path.lower().endswith('.lunac'):
+        raise ValueError("Profile: Bytecode files cannot be profiled, profile the .luna source instead")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Profile: File not found: {path}")
+
     constants.CURRENT_FILE = os.path.abspath(path)
-    run_code(source, debug=debug, sandbox=sandbox)
+
+    ast = load_ast(path)
+    if ast is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = Preprocessor().process(f.read())
+        ast = Parser(get_lexer_class(lexer_backend)(source)).parse()
+        store_ast(path, ast)
+
+    # A failing script still gets the profile of what ran before the error
+    profiler = Profiler()
+    try:
+        interpreter = get_profiling_class(constants.ENGINE)(profiler=profiler)
+        interpreter.execute(optimize(ast))
+    except (LeapException, BreakException, AdvanceException, ReturnException) as e:
+        print(f"{Fore.RED}Runtime Error: Control flow error ({type(e).__name__}){Style.RESET_ALL}")
+    except Exception as e:
+        print(str(e))
+
+    stacks = os.path.splitext(path)[0] + '.folded'
+    profiler.write_collapsed(stacks)
+    print(f"{Fore.YELLOW}[PROFILE]{Style.RESET_ALL} {constants.ENGINE} engine, optimisation level {constants.OPT_LEVEL}")
+    print(profiler.report())
+    print(f"{Fore.YELLOW}[PROFILE]{Style.RESET_ALL} Collapsed stacks written to '{stacks}'")
 
 
 def clean_build():
     try:
         print("Clean: Cleaning...")
-        for folder in ("build", "dist", "__pycache__"):
+        for folder in ("build", "dist", "__pycache__", AST_CACHE_DIR):
             shutil.rmtree(folder, ignore_errors=True)
         for file in os.listdir("."):
             if file.endswith(".spec"):
@@ -304,7 +407,29 @@ def clean_build():
     except Exception as e:
         print(f"Clean error: {e}")
 
+def parse_flags():
+    # Flags may appear anywhere; they are removed so scripts never see them in args()
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            level = arg[2:] or '1'
+            if not level.isdigit():
+                raise ValueError(f"Invalid optimisation level: '{arg}'")
+            constants.OPT_LEVEL = int(level)
+        elif arg.startswith('--engine='):
+            engine = arg[len('--engine='):]
+            get_interpreter_class(engine)
+            constants.ENGINE = engine
+        elif arg.startswith('--lexer='):
+            backend = arg[len('--lexer='):]
+            get_lexer_class(backend)
+            constants.LEXER = backend
+        else:
+            args.append(arg)
+    sys.argv[1:] = args
+
 def main():
+    parse_flags()
     if len(sys.argv) < 2:
         start_repl()
         return
@@ -350,6 +475,17 @@ def main():
             run_file_path(path, debug=True)
         except Exception as e:
             print(str(e))
+        print(f"{Fore.YELLOW}[DEBUG]{Style.RESET_ALL} AST cache: {AST_CACHE_STATS['hits']} hits, {AST_CACHE_STATS['misses']} misses")
+        return
+
+    if command == 'profile':
+        if not path:
+            print("Profile: File not provided.")
+            return
+        try:
+            profile_file_path(path)
+        except Exception as e:
+            print(str(e))
         return
 
     if command == 'build':
@@ -416,9 +552,14 @@ def main():
     print("  compile <file.luna>       --> compile source to .lunac")
     print("  sandbox <file.luna/lunac> --> run code in a safe environment")
     print("  debug <file.luna/lunac>   --> run code with debug output")
+    print("  profile <file.luna>       --> run code and report time per function and line")
     print("  build <file.lunac>        --> bind and compile bytecode into an executable")
     print("  clean                     --> deletes build directories")
     print("  version                   --> display version information")
+    print("  -O<level>                 --> AST optimisation level for run/compile (0 disables all but tail calls, default 1)")
+    print("  --engine=<name>           --> tree-walking engine: visitor (default) or closure")
+    print("  --lexer=<name>            --> lexer backend: classic (default), regex, compact or stream")
+    print("                               (stream reads files as it lexes them, without expanding macros)")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,542 @@
+# Closure Engine
+# --------------
+
+from runtime.interpreter import *
+
+# ==========================================
+# CLOSURE INTERPRETER
+# ==========================================
+
+# Every node is compiled once into a Python closure, and running a program
+# is a chain of calls between those closures with no per-node method lookup.
+# Nodes without a specialised closure run through the visitor method, whose
+# own child visits come back through here, so the two engines mix freely.
+# Closures raise exactly what the visitor would, at the same node.
+
+CONTROL_FLOW = (ReturnException, BreakException, AdvanceException, LeapException)
+
+ARITHMETIC_OPS = {
+    TOKEN_PLUS: lambda a, b: a + b,
+    TOKEN_MINUS: lambda a, b: a - b,
+    TOKEN_MUL: lambda a, b: a * b,
+    TOKEN_DIV: lambda a, b: a / b,
+}
+
+PLAIN_OPS = {
+    TOKEN_BIT_AND: lambda a, b: a & b,
+    TOKEN_BIT_OR: lambda a, b: a | b,
+    TOKEN_BIT_XOR: lambda a, b: a ^ b,
+    TOKEN_LSHIFT: lambda a, b: a << b,
+    TOKEN_RSHIFT: lambda a, b: a >> b,
+    TOKEN_GT: lambda a, b: a > b,
+    TOKEN_LT: lambda a, b: a < b,
+    TOKEN_GE: lambda a, b: a >= b,
+    TOKEN_LE: lambda a, b: a <= b,
+    TOKEN_EQ: lambda a, b: a == b,
+    TOKEN_NEQ: lambda a, b: a != b,
+}
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # id(node) -> (node, closure); the node is kept so its id stays unique
+        self.closures = {}
+
+    def visit(self, node):
+        entry = self.closures.get(id(node))
+        if entry is None:
+            return self.compile(node)()
+        return entry[1]()
+
+    def compile(self, node):
+        entry = self.closures.get(id(node))
+        if entry is not None:
+            return entry[1]
+
+        builder = getattr(self, f"compile_{type(node).__name__}", None)
+        fn = builder(node) if builder is not None else self.fallback(node)
+        if self.safe_mode:
+            fn = self.sandboxed(fn, node)
+        self.closures[id(node)] = (node, fn)
+        return fn
+
+    def fallback(self, node):
+        visit = Interpreter.visit
+        return lambda: visit(self, node)
+
+    def sandboxed(self, fn, node):
+        def run():
+            if self.safe_violation_reason:
+                raise lunite_error("Sandbox", self.safe_violation_reason, getattr(node, 'line', 0), getattr(node, 'col', 0))
+            return fn()
+        return run
+
+    def fail(self, e, node):
+        # What Interpreter.visit turns an exception escaping `node` into
+        if isinstance(e, CONTROL_FLOW) or (hasattr(e, "has_location") and e.has_location):
+            return e
+        return lunite_error("Runtime", str(e), node.line, node.col)
+
+    def called_from(self, e, node):
+        # Located errors leaving a call get the call site appended
+        if isinstance(e, CONTROL_FLOW) or not (hasattr(e, "has_location") and e.has_location):
+            return self.fail(e, node)
+        if e.args:
+            stack_trace = f"\n{Fore.YELLOW}   called from:{Style.RESET_ALL} {constants.CURRENT_FILE}:{node.line}:{node.col}"
+            e.args = (e.args[0] + stack_trace,) + e.args[1:]
+        return e
+
+    # ==========================================
+    # LITERALS
+    # ==========================================
+
+    def compile_Number(self, node):
+        value = node.token.value
+        return lambda: value
+
+    compile_String = compile_Number
+
+    def compile_Char(self, node):
+        value = node.token.value
+        return lambda: LChar(value)
+
+    def compile_Boolean(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_Null(self, node):
+        return lambda: None
+
+    def compile_FString(self, node):
+        parts = [part if part.__class__ is str else self.compile(part) for part in node.parts]
+        stringify = self.stringify
+        def run():
+            try:
+                return ''.join([part if part.__class__ is str else stringify(part()) for part in parts])
+            except Exception as e:
+                raise self.fail(e, node)
+        return run
+
+    def compile_ListLiteral(self, node):
+        elements = [self.compile(e) for e in node.elements]
+        return lambda: [e() for e in elements]
+
+    def compile_DictLiteral(self, node):
+        pairs = [(self.compile(k), self.compile(v)) for k, v in node.pairs]
+        def run():
+            try:
+                return {k(): v() for k, v in pairs}
+            except Exception as e:
+                raise self.fail(e, node)
+        return run
+
+    # ==========================================
+    # NAMES
+    # ==========================================
+
+    def compile_Identifier(self, node):
+        name, line, col = node.token.value, node.line, node.col
+        def run():
+            env = self.env
+            values = env.values
+            if name in values:
+                return values[name]
+            return env.get(name, line, col)
+        return run
+
+    def compile_VarDecl(self, node):
+        value = self.compile(node.value)
+        name, is_const, is_public, is_global = node.name, node.is_const, node.is_public, node.is_global
+        def run():
+            val = value()
+            self._get_target_env(is_global).define(name, val, is_const=is_const, is_public=is_public)
+            return val
+        return run
+
+    def compile_Assign(self, node):
+        if not isinstance(node.left, Identifier):
+            return self.fallback(node)
+        value = self.compile(node.value)
+        name, line, col = node.left.token.value, node.line, node.col
+        def run():
+            val = value()
+            self.env.assign(name, val, line, col)
+            return val
+        return run
+
+    def compile_CompoundAssign(self, node):
+        if not isinstance(node.left, Identifier):
+            return self.fallback(node)
+        value = self.compile(node.value)
+        op = node.op.type
+        target = node.left
+        name = target.token.value
+        def run():
+            curr_val = self.env.get(name, node.line, node.col)
+            right_val = value()
+            new_val = curr_val
+            try:
+                # In-place operators, so `list += list` still extends the same list
+                if op == TOKEN_PLUSEQ: new_val += right_val
+                elif op == TOKEN_MINUSEQ: new_val -= right_val
+                elif op == TOKEN_MULEQ: new_val *= right_val
+                elif op == TOKEN_DIVEQ: new_val /= right_val
+                elif op == TOKEN_MODEQ:
+                    new_val = math.fmod(curr_val, right_val)
+                    if isinstance(curr_val, int) and isinstance(right_val, int):
+                        new_val = int(new_val)
+            except Exception as e:
+                raise self.fail(e, node)
+            self.env.assign(name, new_val, target.token.line, target.token.col)
+            return new_val
+        return run
+
+    def compile_UpdateExpr(self, node):
+        if not isinstance(node.target, Identifier):
+            return self.fallback(node)
+        name, line, col = node.target.token.value, node.line, node.col
+        delta = 1 if node.op.type == TOKEN_INC else -1
+        is_prefix = node.is_prefix
+        def run():
+            curr_val = self.env.get(name, line, col)
+            if not isinstance(curr_val, (int, float)):
+                raise lunite_error("Type", "Cannot increment/decrement non-numeric value", line, col)
+            new_val = curr_val + delta
+            self.env.assign(name, new_val, line, col)
+            return new_val if is_prefix else curr_val
+        return run
+
+    # ==========================================
+    # OPERATORS
+    # ==========================================
+
+    def compile_UnaryOp(self, node):
+        expr = self.compile(node.expr)
+        op = node.op.type
+        if op == TOKEN_NOT:
+            return lambda: not expr()
+        if op == TOKEN_MINUS: apply = lambda v: -v
+        elif op == TOKEN_PLUS: apply = lambda v: +v
+        elif op == TOKEN_BIT_NOT: apply = lambda v: ~v
+        else: return expr
+        def run():
+            val = expr()
+            try:
+                return apply(val)
+            except Exception as e:
+                raise self.fail(e, node)
+        return run
+
+    def compile_BinaryOp(self, node):
+        op = node.op.type
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+
+        if op == TOKEN_AND:
+            return lambda: False if not left() else right()
+        if op == TOKEN_OR:
+            return lambda: True if left() else right()
+
+        if op in ARITHMETIC_OPS or op == TOKEN_MOD:
+            apply = ARITHMETIC_OPS.get(op, self.lunite_mod)
+            def run():
+                l = left()
+                r = right()
+                try:
+                    return apply(l, r)
+                except TypeError:
+                    raise lunite_error(
+                        "Type",
+                        f"Unsupported operand types for '{TOKEN_NAMES[op]}': '{type(l).__name__}' and '{type(r).__name__}'",
+                        node.line,
+                        node.col
+                    )
+                except ZeroDivisionError:
+                    raise lunite_error("Math", "Division by zero", node.line, node.col)
+                except Exception as e:
+                    raise self.fail(e, node)
+            return run
+
+        if op in PLAIN_OPS:
+            apply = PLAIN_OPS[op]
+            # Right-hand literals such as `n - 1` or `i < 10` skip a call
+            if isinstance(node.right, (Number, String)):
+                value = node.right.token.value
+                def run():
+                    l = left()
+                    try:
+                        return apply(l, value)
+                    except Exception as e:
+                        raise self.fail(e, node)
+                return run
+            def run():
+                l = left()
+                r = right()
+                try:
+                    return apply(l, r)
+                except Exception as e:
+                    raise self.fail(e, node)
+            return run
+
+        return self.fallback(node)
+
+    @staticmethod
+    def lunite_mod(left, right):
+        val = math.fmod(left, right)
+        if isinstance(left, int) and isinstance(right, int):
+            return int(val)
+        return val
+
+    def compile_TernaryOp(self, node):
+        condition = self.compile(node.condition)
+        true_expr = self.compile(node.true_expr)
+        false_expr = self.compile(node.false_expr)
+        return lambda: true_expr() if condition() else false_expr()
+
+    def compile_IndexAccess(self, node):
+        target = self.compile(node.target)
+        index = self.compile(node.index)
+        def run():
+            t = target()
+            i = index()
+            try:
+                return t[i]
+            except KeyError:
+                raise lunite_error("Key", f"Key '{i}' not found in dictionary", node.line, node.col)
+            except IndexError:
+                raise lunite_error("Index", f"Index '{i}' out of bounds", node.line, node.col)
+            except Exception as e:
+                raise lunite_error("Index", f"Invalid access operation: {str(e)}", node.line, node.col)
+        return run
+
+    # ==========================================
+    # STATEMENTS
+    # ==========================================
+
+    def compile_Block(self, node):
+        statements = node.statements
+        compiled = [self.compile(stmt) for stmt in statements]
+        count = len(compiled)
+
+        def leap_index(target):
+            for idx, s in enumerate(statements):
+                if isinstance(target, str):
+                    if isinstance(s, LabelDef) and s.name == target:
+                        return idx
+                elif isinstance(target, int):
+                    if s.line >= target:
+                        return idx
+            return None
+
+        def run():
+            result = None
+            i = 0
+            while True:
+                try:
+                    while i < count:
+                        result = compiled[i]()
+                        if result.__class__ is Completion:
+                            return result
+                        i += 1
+                    return result
+                except LeapException as e:
+                    i = leap_index(e.target)
+                    if i is None:
+                        raise e
+        return run
+
+    def compile_IfStatement(self, node):
+        condition = self.compile(node.condition)
+        true_block = self.compile(node.true_block)
+        false_block = self.compile(node.false_block) if node.false_block else None
+        if not node.true_block.declares and not (node.false_block and node.false_block.declares):
+            if false_block is None:
+                return lambda: true_block() if condition() else None
+            return lambda: true_block() if condition() else false_block()
+        def run():
+            if condition():
+                block = true_block
+                declares = node.true_block.declares
+            elif false_block is not None:
+                block = false_block
+                declares = node.false_block.declares
+            else:
+                return None
+            if not declares:
+                return block()
+            prev = self.env
+            self.env = Environment(prev)
+            try:
+                return block()
+            finally:
+                self.env = prev
+        return run
+
+    def compile_WhileStatement(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        declares, reuse_scope = node.body.declares, node.reuse_scope
+        def run():
+            prev = self.env
+            shared = None
+            if not declares:
+                shared = prev
+            elif reuse_scope:
+                shared = Environment(prev)
+
+            while condition():
+                if shared is None:
+                    self.env = Environment(prev)
+                else:
+                    if shared is not prev:
+                        shared.reset()
+                    self.env = shared
+                try:
+                    result = body()
+                except BreakException:
+                    break
+                except AdvanceException:
+                    continue
+                finally:
+                    self.env = prev
+                if result.__class__ is Completion:
+                    if result is BREAK: break
+                    if result is ADVANCE: continue
+                    return result
+        return run
+
+    def compile_ForStatement(self, node):
+        iterable_fn = self.compile(node.iterable)
+        body = self.compile(node.body)
+        name = node.iterator_name
+        declares, reuse_scope = node.body.declares, node.reuse_scope
+        def run():
+            iterable = iterable_fn()
+            if not hasattr(iterable, '__iter__'):
+                raise lunite_error("Loop", "Expected iterable for 'for' loop", node.line, node.col)
+
+            prev_env = self.env
+            shared = Environment(prev_env) if reuse_scope else None
+            try:
+                for item in iterable:
+                    if shared is None:
+                        loop_env = Environment(prev_env)
+                    else:
+                        loop_env = shared
+                        if declares:
+                            loop_env.reset()
+                    loop_env.define(name, item)
+                    self.env = loop_env
+                    try:
+                        result = body()
+                    except BreakException:
+                        break
+                    except AdvanceException:
+                        continue
+                    if result.__class__ is Completion:
+                        if result is BREAK: break
+                        if result is ADVANCE: continue
+                        return result
+            except Exception as e:
+                raise self.fail(e, node)
+            finally:
+                self.env = prev_env
+        return run
+
+    def compile_ReturnStatement(self, node):
+        value = self.compile(node.value)
+        if node.value.__class__ is not FunctionCall or not node.value.tail_call:
+            return lambda: Completion(ReturnException, value())
+
+        def run():
+            result = value()
+            if result.__class__ is Completion:
+                return result
+            return Completion(ReturnException, result)
+        return run
+
+    def compile_BreakStatement(self, node):
+        return lambda: BREAK
+
+    def compile_AdvanceStatement(self, node):
+        return lambda: ADVANCE
+
+    # ==========================================
+    # CALLS
+    # ==========================================
+
+    def compile_arguments(self, arg_nodes):
+        positional, keyword = [], []
+        for arg in arg_nodes:
+            if isinstance(arg, Assign) and isinstance(arg.left, Identifier):
+                keyword.append((arg.left.token.value, self.compile(arg.value)))
+            elif keyword:
+                # Positional after keyword: let the visitor raise it in order
+                return lambda: self._evaluate_arguments(arg_nodes)
+            else:
+                positional.append(self.compile(arg))
+
+        if not keyword:
+            return lambda: ([arg() for arg in positional], {})
+        return lambda: ([arg() for arg in positional], {key: arg() for key, arg in keyword})
+
+    def compile_FunctionCall(self, node):
+        name, line, col, tail_call = node.name, node.line, node.col, node.tail_call
+        arguments = self.compile_arguments(node.args)
+
+        def call():
+            func = self.env.get(name, line, col)
+
+            if isinstance(func, (FunctionDef, LambdaExpr)):
+                prev_env = self.env
+                new_env = Environment(getattr(func, 'closure', self.global_env))
+                pos_args, kw_args = arguments()
+                ArgumentBinder.of(func).bind(self, new_env, pos_args, kw_args, FUNCTION_ARGS, line, col)
+                if tail_call and func.__class__ is FunctionDef:
+                    return Completion(TailCallException, (func, new_env))
+
+                body = self.compile(func.body)
+                old_file = constants.CURRENT_FILE
+                if hasattr(func, 'source_file'): constants.CURRENT_FILE = func.source_file
+
+                self.env = new_env
+                try:
+                    if isinstance(func.body, Block):
+                        return self._function_result(body())
+                    return body()
+                except ReturnException as e:
+                    return e.value
+                finally:
+                    self.env = prev_env
+                    constants.CURRENT_FILE = old_file
+
+            if callable(func):
+                try:
+                    pos_args, kw_args = arguments()
+                    return func(*pos_args, **kw_args)
+                except Exception as e:
+                    if hasattr(e, "has_location") and e.has_location: raise e
+                    raise lunite_error("Function", str(e), line, col)
+
+            raise lunite_error("Function", f"'{name}' is not a function", line, col)
+
+        def run():
+            try:
+                return call()
+            except Exception as e:
+                raise self.called_from(e, node)
+        return run
+
+# ==========================================
+# ENGINES
+# ==========================================
+
+INTERPRETER_ENGINES = {
+    'visitor': Interpreter,
+    'closure': ClosureInterpreter,
+}
+
+def get_interpreter_class(engine='visitor'):
+    if engine not in INTERPRETER_ENGINES:
+        raise lunite_error("Interpreter", f"Unknown engine '{engine}', expected one of: {', '.join(INTERPRETER_ENGINES)}")
+    return INTERPRETER_ENGINES[engine]
@@ -7,12 +7,15 @@ from core.errors import *
 # ENVIRONMENT
 # ==========================================
 
+# Constant and non-public names are rare, so their sets are only created
+# when the first one is defined; a plain binding costs one dict entry.
+
 class Environment:
-    __slots__ = ('values', 'constants', 'parent', 'permissions')
+    __slots__ = ('values', 'constants', 'private', 'parent')
     def __init__(self, parent=None):
         self.values = {}
-        self.constants = set()
-        self.permissions = {}
+        self.constants = None
+        self.private = None
         self.parent = parent
 
     def get(self, name, line, col):
@@ -26,20 +29,33 @@ class Environment:
 
     def define(self, name, value, is_const=False, is_public=True):
         self.values[name] = value
-        self.permissions[name] = {'public': is_public}
+        if is_public:
+            if self.private is not None:
+                self.private.discard(name)
+        elif self.private is None:
+            self.private = {name}
+        else:
+            self.private.add(name)
         if is_const:
-            self.constants.add(name)
+            if self.constants is None:
+                self.constants = {name}
+            else:
+                self.constants.add(name)
+
+    def reset(self):
+        # Empties the scope so a loop can run its next iteration in it
+        self.values.clear()
+        self.constants = None
+        self.private = None
 
     def is_public(self, name):
-        if name in self.permissions:
-            return self.permissions[name]['public']
-        return True
+        return self.private is None or name not in self.private
 
     def assign(self, name, value, line, col):
         current = self
         while current is not None:
             if name in current.values:
-                if name in current.constants:
+                if current.constants is not None and name in current.constants:
                     raise lunite_error("Runtime", f"Cannot reassign constant '{name}'", line, col)
                 current.values[name] = value
                 return
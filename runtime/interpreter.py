@@ -18,6 +18,8 @@ import importlib
 import asyncio
 import threading
 import ctypes
+from collections import OrderedDict
+from types import MappingProxyType
 
 try:
     import psutil
@@ -29,6 +31,8 @@ import core.constants as constants
 from core.ast import *
 from core.types import *
 from core.parser import *
+from core.cache import *
+from core.optimizer import optimize, literal_value, NO_VALUE
 
 from runtime.environment import *
 
@@ -173,6 +177,185 @@ class SafeModeResourceMonitor:
                 self._terminate(reason)
 
 
+# ==========================================
+# CLASS TABLES
+# ==========================================
+
+class ClassTable:
+    # What `new` needs from a class, shared by all of its instances: the
+    # ancestors (root first), the merged methods and the class-body
+    # statements that set up fields, one list per class in the chain
+    __slots__ = ('mold', 'ancestors', 'names', 'methods', 'initialisers')
+
+    def __init__(self, mold, ancestors, methods, initialisers):
+        self.mold = mold
+        self.ancestors = ancestors
+        self.names = frozenset(c.name for c in ancestors)
+        # Handed to every instance, so read-only; see LuniteInstance.set_method
+        self.methods = MappingProxyType(methods)
+        self.initialisers = initialisers
+
+# ==========================================
+# ARGUMENT BINDING
+# ==========================================
+
+# What each kind of call raises: the error kind, then the messages for too
+# many positional arguments, a duplicated argument and a missing one. A None
+# message turns that check off.
+FUNCTION_ARGS = ("Function", "Too many positional arguments", "Multiple values for argument '{}'", "Missing argument for '{}'")
+METHOD_ARGS = ("Method", "Too many positional arguments for '{}'", "Multiple values for '{}'", "Missing argument for '{}'")
+CONSTRUCTOR_ARGS = ("Class", "Too many constructor arguments", "Multiple values for '{}'", "Missing constructor argument '{}'")
+CALLBACK_ARGS = ("Callback", None, None, "Missing argument '{}'")
+LENIENT_ARGS = (None, None, None, None)
+
+class ArgumentBinder:
+    # The parameter list of one function, unpacked once and kept on its node.
+    # Literal defaults are stored as values so binding them needs no visit.
+    __slots__ = ('names', 'index', 'tails', 'count')
+
+    def __init__(self, params):
+        params = [(p[0], p[1]) if isinstance(p, (list, tuple)) else (p, None) for p in params]
+        params = tuple(
+            (name, default, NO_VALUE if default is None else literal_value(default))
+            for name, default in params
+        )
+        self.names = tuple(name for name, _, _ in params)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.count = len(params)
+        # The parameters left to fill once the first i came positionally
+        self.tails = tuple(params[i:] for i in range(self.count + 1))
+
+    @staticmethod
+    def of(func):
+        binder = func.binder
+        if binder is None:
+            binder = func.binder = ArgumentBinder(func.params)
+        return binder
+
+    def bind(self, interpreter, env, pos_args, kw_args, errors, line, col, call_name=None):
+        # The scope is fresh and public, so arguments go straight into its values
+        values = env.values
+        given = len(pos_args)
+        if given == self.count and not kw_args:
+            for name, arg in zip(self.names, pos_args):
+                values[name] = arg
+            return
+
+        if given > self.count:
+            if errors[1] is not None:
+                raise lunite_error(errors[0], errors[1].format(call_name), line, col)
+            given = self.count
+
+        if kw_args and errors[2] is not None:
+            # Report the first parameter that was given both ways
+            first = given
+            for name in kw_args:
+                i = self.index.get(name, given)
+                if i < first:
+                    first = i
+            if first < given:
+                raise lunite_error(errors[0], errors[2].format(self.names[first]), line, col)
+
+        for name, arg in zip(self.names, pos_args):
+            values[name] = arg
+        for name, default, value in self.tails[given]:
+            if name in kw_args:
+                values[name] = kw_args[name]
+            elif value is not NO_VALUE:
+                values[name] = value
+            elif default is not None:
+                values[name] = interpreter.visit(default)
+            elif errors[3] is not None:
+                raise lunite_error(errors[0], errors[3].format(name), line, col)
+
+# ==========================================
+# MEMOISATION
+# ==========================================
+
+MEMO_DEFAULT_SIZE = 128
+MEMO_MISSING = object()
+
+def memo_key(value):
+    # Equal arguments give equal keys: lists, tuples, dicts and sets by their
+    # contents, and everything else by value and type, so 1, 1.0 and true
+    # stay apart. Unhashable values raise TypeError, and containers that hold
+    # themselves RecursionError.
+    cls = value.__class__
+    if cls is int or cls is str:
+        return value
+    if cls is list or cls is tuple:
+        return (cls, tuple([memo_key(item) for item in value]))
+    if cls is dict:
+        return (cls, frozenset([(memo_key(k), memo_key(v)) for k, v in value.items()]))
+    if cls is set:
+        return (cls, frozenset([memo_key(item) for item in value]))
+    hash(value)
+    return (cls, value)
+
+class MemoizedFunction:
+    # What @memo turns a function into. `invoke` makes the real call, so each
+    # engine passes in its own; results are kept for the `maxsize` most
+    # recently used argument lists, or for all of them when it is null.
+    __slots__ = ('func', 'invoke', 'maxsize', 'cache', 'hits', 'misses', 'evictions')
+
+    def __init__(self, func, invoke, maxsize=MEMO_DEFAULT_SIZE):
+        self.func = func
+        self.invoke = invoke
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __call__(self, *args, **kwargs):
+        try:
+            key = memo_key(args) if not kwargs else (memo_key(args), memo_key(kwargs))
+        except (TypeError, RecursionError):
+            self.misses += 1
+            return self.invoke(self.func, args, kwargs)
+
+        cache = self.cache
+        value = cache.get(key, MEMO_MISSING)
+        if value is not MEMO_MISSING:
+            self.hits += 1
+            cache.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = self.invoke(self.func, args, kwargs)
+        cache[key] = value
+        if self.maxsize is not None and len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def __repr__(self):
+        return f"<memo {getattr(self.func, 'name', 'function')}>"
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = self.misses = self.evictions = 0
+
+def make_memo(invoke):
+    # `@memo` and `@memo()` wrap with the default size; `@memo(n)` and
+    # `@memo(null)` first pick the size and return the decorator
+    def memo(target=MEMO_MISSING):
+        if target is MEMO_MISSING:
+            target = MEMO_DEFAULT_SIZE
+        if target is None or (isinstance(target, int) and not isinstance(target, bool)):
+            if target is not None and target < 1:
+                raise Exception("memo size must be at least 1, or null for no limit")
+            return lambda func: MemoizedFunction(func, invoke, target)
+        return MemoizedFunction(target, invoke)
+    return memo
+
 # ==========================================
 # LUNITE INTERPRETER
 # ==========================================
@@ -188,6 +371,10 @@ class Interpreter:
         self.env = self.global_env
         self.imported_files = imported_files if imported_files else {}
         self.visit_cache = {}
+        self.class_tables = {}
+        # Lookups on instances by MethodCall and MemberAccess sites, only
+        # counted in debug mode so the cached paths stay free of bookkeeping
+        self.inline_cache_stats = {'hits': 0, 'misses': 0}
 
         if self.safe_mode:
             self.safe_monitor = SafeModeResourceMonitor(self)
@@ -210,19 +397,7 @@ class Interpreter:
         if isinstance(func, (FunctionDef, LambdaExpr)):
             prev_env = self.env
             method_env = Environment(self.global_env) 
-            
-            f_params = func.params
-            if isinstance(func, LambdaExpr):
-                f_params = [(p, None) for p in f_params]
-
-            for i, (p_name, p_default) in enumerate(f_params):
-                if i < len(args):
-                    method_env.define(p_name, args[i])
-                elif p_default is not None:
-                    val = self.visit(p_default)
-                    method_env.define(p_name, val)
-                else:
-                    raise lunite_error("Callback", f"Missing argument '{p_name}'", line, col)
+            ArgumentBinder.of(func).bind(self, method_env, args, {}, CALLBACK_ARGS, line, col)
 
             old_file = constants.CURRENT_FILE
             if hasattr(func, 'source_file'): constants.CURRENT_FILE = func.source_file
@@ -230,15 +405,13 @@ class Interpreter:
             self.env = method_env
             try:
                 if isinstance(func.body, Block):
-                    self.visit(func.body)
-                else:
-                    return self.visit(func.body)
+                    return self._function_result(self.visit(func.body))
+                return self.visit(func.body)
             except ReturnException as e:
                 return e.value
             finally:
                 self.env = prev_env
                 constants.CURRENT_FILE = old_file
-            return None
 
         if callable(func):
             try:
@@ -248,32 +421,79 @@ class Interpreter:
             
         raise lunite_error("Type", f"'{type(func).__name__}' is not callable", line, col)
 
+    def call_function(self, func, args, kwargs):
+        # Calls a function value from Python with the argument checks of a
+        # call written in Lunite
+        if not isinstance(func, (FunctionDef, LambdaExpr)):
+            return func(*args, **kwargs)
+
+        prev_env = self.env
+        new_env = Environment(getattr(func, 'closure', self.global_env))
+        ArgumentBinder.of(func).bind(self, new_env, args, kwargs, FUNCTION_ARGS, None, None)
+
+        old_file = constants.CURRENT_FILE
+        if hasattr(func, 'source_file'): constants.CURRENT_FILE = func.source_file
+
+        self.env = new_env
+        try:
+            if isinstance(func.body, Block):
+                return self._function_result(self.visit(func.body))
+            return self.visit(func.body)
+        except ReturnException as e:
+            return e.value
+        finally:
+            self.env = prev_env
+            constants.CURRENT_FILE = old_file
+
     def execute_node_as_call(self, func_node, args, kwargs):
         prev_env = self.env
         
         closure_env = getattr(func_node, 'closure', self.global_env)
         new_env = Environment(closure_env)
-        
-        f_params = func_node.params
-        for i, param_data in enumerate(f_params):
-            p_name = param_data[0] if isinstance(param_data, (list, tuple)) else param_data
-            
-            if i < len(args):
-                new_env.define(p_name, args[i])
-            elif isinstance(param_data, (list, tuple)) and param_data[1] is not None:
-                new_env.define(p_name, self.visit(param_data[1]))
+        ArgumentBinder.of(func_node).bind(self, new_env, args, {}, LENIENT_ARGS, None, None)
         self.env = new_env
         try:
             if isinstance(func_node.body, Block):
-                self.visit(func_node.body)
-            else:
-                return self.visit(func_node.body)
+                return self._function_result(self.visit(func_node.body))
+            return self.visit(func_node.body)
         except ReturnException as e:
             return e.value
         finally:
             self.env = prev_env
+
+    def _function_result(self, result):
+        # What a call returns once its body block has finished
+        if result.__class__ is Completion:
+            if result.kind is TailCallException:
+                result = self._tail_calls(result)
+                if result.__class__ is not Completion:
+                    return None
+            if result.kind is ReturnException:
+                return result.value
+            raise result.as_exception()
         return None
 
+    def _tail_calls(self, result):
+        # Each `return f(...)` ended the last body with f's arguments already
+        # bound, so f runs here in place of a nested call. The caller puts
+        # its own scope back afterwards.
+        old_file = constants.CURRENT_FILE
+        try:
+            while result.__class__ is Completion and result.kind is TailCallException:
+                func, self.env = result.value
+                constants.CURRENT_FILE = func.source_file
+                result = self.visit(func.body)
+        finally:
+            constants.CURRENT_FILE = old_file
+        return result
+
+    def execute(self, node):
+        # Runs a program or module, where no jump has anywhere left to go
+        result = self.visit(node)
+        if result.__class__ is Completion:
+            raise result.as_exception()
+        return result
+
     def setup_std_lib(self):
         def clean_str(val):
             if isinstance(val, bool): return "true" if val else "false"
@@ -285,15 +505,17 @@ class Interpreter:
             if isinstance(val, (set, tuple)): return str(val)
             return str(val)
 
+        self.stringify = clean_str
+
         def make_static_lib(name, wrapper_cls, fields=None):
             obj = LuniteInstance(ClassDef(name, Block([]), None))
             for method in dir(wrapper_cls):
                 if not method.startswith('__'):
-                    obj.methods[method] = getattr(wrapper_cls, method)
+                    obj.set_method(method, getattr(wrapper_cls, method))
             if fields:
                 for k, v in fields.items():
-                    obj.fields[k] = v
-                    obj.constants.add(k)
+                    obj.set(k, v)
+                    obj.make_constant(k)
             self.global_env.define(name, obj)
 
         def register_static_lib(name, wrapper_cls, fields=None, safe=True):
@@ -805,6 +1027,7 @@ class Interpreter:
         self.global_env.define('len', lambda x: len(x))
         self.global_env.define('type', get_type)
         self.global_env.define('raise', lambda msg: (_ for _ in ()).throw(Exception(msg)))
+        self.global_env.define('memo', make_memo(self.call_function))
     
     def visit(self, node):
         if self.safe_mode and self.safe_violation_reason:
@@ -847,6 +1070,8 @@ class Interpreter:
             stmt = statements[i]
             try:
                 result = self.visit(stmt)
+                if result.__class__ is Completion:
+                    return result
                 i += 1
             except LeapException as e:
                 target = e.target
@@ -876,6 +1101,10 @@ class Interpreter:
     def visit_String(self, node):
         return node.token.value
     
+    def visit_FString(self, node):
+        stringify = self.stringify
+        return ''.join([part if part.__class__ is str else stringify(self.visit(part)) for part in node.parts])
+    
     def visit_Char(self, node):
         return LChar(node.token.value)
 
@@ -900,21 +1129,25 @@ class Interpreter:
     def visit_MatchStatement(self, node):
         subject_val = self.visit(node.subject)
         matched = False
+        result = None
         
         try:
             for case in node.cases:
                 case_val = self.visit_MatchCase(case)
                 
                 if subject_val == case_val:
-                    self.visit(case.body)
+                    result = self.visit(case.body)
                     matched = True
                     break
             
             if not matched and node.default_block:
-                self.visit(node.default_block)
+                result = self.visit(node.default_block)
 
         except BreakException:
             pass
+
+        if result.__class__ is Completion and result.kind is not BreakException:
+            return result
     
     def visit_UnaryOp(self, node):
         op = node.op.type
@@ -956,7 +1189,7 @@ class Interpreter:
         except TypeError:
             raise lunite_error(
                 "Type", 
-                f"Unsupported operand types for '{op}': '{type(left).__name__}' and '{type(right).__name__}'", 
+                f"Unsupported operand types for '{TOKEN_NAMES[op]}': '{type(left).__name__}' and '{type(right).__name__}'", 
                 node.line, 
                 node.col
             )
@@ -1090,26 +1323,41 @@ class Interpreter:
 
     def visit_IfStatement(self, node):
         if self.visit(node.condition):
-            prev = self.env
-            self.env = Environment(prev)
-            try:
-                return self.visit(node.true_block)
-            finally:
-                self.env = prev
+            block = node.true_block
         elif node.false_block:
-            prev = self.env
-            self.env = Environment(prev)
-            try:
-                return self.visit(node.false_block)
-            finally:
-                self.env = prev
+            block = node.false_block
+        else:
+            return None
+
+        if not block.declares:
+            return self.visit(block)
+        prev = self.env
+        self.env = Environment(prev)
+        try:
+            return self.visit(block)
+        finally:
+            self.env = prev
 
     def visit_WhileStatement(self, node):
+        prev = self.env
+        body = node.body
+        # A body that binds nothing runs in the enclosing scope; otherwise
+        # each iteration gets a fresh scope, or the shared one emptied
+        shared = None
+        if not body.declares:
+            shared = prev
+        elif node.reuse_scope:
+            shared = Environment(prev)
+
         while self.visit(node.condition):
-            prev = self.env
-            self.env = Environment(prev)
+            if shared is None:
+                self.env = Environment(prev)
+            else:
+                if shared is not prev:
+                    shared.reset()
+                self.env = shared
             try:
-                self.visit(node.body)
+                result = self.visit(body)
             except BreakException:
                 self.env = prev
                 break
@@ -1118,6 +1366,10 @@ class Interpreter:
                 continue
             finally:
                 self.env = prev
+            if result.__class__ is Completion:
+                if result is BREAK: break
+                if result is ADVANCE: continue
+                return result
     
     def visit_ForStatement(self, node):
         iterable = self.visit(node.iterable)
@@ -1125,12 +1377,19 @@ class Interpreter:
             raise lunite_error("Loop", "Expected iterable for 'for' loop", node.line, node.col)
 
         prev_env = self.env
+        body = node.body
+        shared = Environment(prev_env) if node.reuse_scope else None
         for item in iterable:
-            loop_env = Environment(prev_env)
+            if shared is None:
+                loop_env = Environment(prev_env)
+            else:
+                loop_env = shared
+                if body.declares:
+                    loop_env.reset()
             loop_env.define(node.iterator_name, item)
             self.env = loop_env
             try:
-                self.visit(node.body)
+                result = self.visit(body)
             except ReturnException as e:
                 self.env = prev_env
                 raise e 
@@ -1140,13 +1399,18 @@ class Interpreter:
             except AdvanceException:
                 self.env = prev_env
                 continue
+            if result.__class__ is Completion:
+                if result is BREAK: break
+                if result is ADVANCE: continue
+                self.env = prev_env
+                return result
         self.env = prev_env
 
     def visit_BreakStatement(self, node):
-        raise BreakException()
+        return BREAK
 
     def visit_AdvanceStatement(self, node):
-        raise AdvanceException()
+        return ADVANCE
 
     def visit_LeapStatement(self, node):
         if isinstance(node.target, Identifier):
@@ -1160,11 +1424,16 @@ class Interpreter:
     def visit_TryCatchStatement(self, node):
         try:
             prev = self.env
-            self.env = Environment(prev)
+            if node.try_block.declares:
+                self.env = Environment(prev)
             try:
-                return self.visit(node.try_block)
+                result = self.visit(node.try_block)
             finally:
                 self.env = prev
+            if result.__class__ is Completion and result.kind is not ReturnException:
+                # break/advance out of an attempt block end up in its rescue
+                raise result.as_exception()
+            return result
         except Exception as e:
             if isinstance(e, (ReturnException)): raise e
             
@@ -1182,11 +1451,14 @@ class Interpreter:
         finally:
             if node.finally_block:
                 prev = self.env
-                self.env = Environment(prev)
+                if node.finally_block.declares:
+                    self.env = Environment(prev)
                 try:
-                    self.visit(node.finally_block)
+                    result = self.visit(node.finally_block)
                 finally:
                     self.env = prev
+                if result.__class__ is Completion:
+                    raise result.as_exception()
 
     def visit_ImportStatement(self, node):
         ctx_dir = os.path.dirname(os.path.abspath(constants.CURRENT_FILE)) if constants.CURRENT_FILE != "REPL" else os.getcwd()
@@ -1218,11 +1490,12 @@ class Interpreter:
             self.env.define(alias, module_obj)
             return 
 
-        try:
-            with open(target_file, 'r') as f:
-                code = f.read()
-        except Exception as e:
-            raise lunite_error("Import", f"Failed to read file: {str(e)}", node.line, node.col)
+        ast = load_ast(target_file, preprocessed=False)
+        if ast is None:
+            try:
+                source_file = open(target_file, 'r')
+            except Exception as e:
+                raise lunite_error("Import", f"Failed to read file: {str(e)}", node.line, node.col)
 
         alias = os.path.splitext(os.path.basename(node.module_name))[0]
         module_def = ClassDef(alias, Block([]), None)
@@ -1240,18 +1513,20 @@ class Interpreter:
         constants.CURRENT_FILE = target_file
         
         try:
-            lexer = Lexer(code)
-            tokens = list(lexer)
-            parser = Parser(tokens)
-            ast = parser.parse()
-            self.visit(ast)
+            if ast is None:
+                with source_file:
+                    lexer = StreamLexer(source_file)
+                    parser = Parser(lexer)
+                    ast = parser.parse()
+                store_ast(target_file, ast, preprocessed=False)
+            self.execute(optimize(ast))
         finally:
             self.env = old_env
             constants.CURRENT_FILE = old_file
 
         for name, value in module_env.values.items():
             if module_env.is_public(name):
-                module_obj.fields[name] = value
+                module_obj.set(name, value)
             
         self.imported_files[target_file] = module_obj
         self.env.define(alias, module_obj)
@@ -1274,10 +1549,9 @@ class Interpreter:
                 new_env.define(param_name, original_func)
             self.env = new_env
             try:
-                if isinstance(decorator.body, Block):
-                    wrapped_func = self.visit(decorator.body)
-                else:
-                    wrapped_func = self.visit(decorator.body)
+                wrapped_func = self.visit(decorator.body)
+                if wrapped_func.__class__ is Completion:
+                    wrapped_func = self._function_result(wrapped_func)
             except ReturnException as e:
                 wrapped_func = e.value
             finally:
@@ -1342,8 +1616,10 @@ class Interpreter:
         return node
 
     def visit_ReturnStatement(self, node):
-        val = self.visit(node.value)
-        raise ReturnException(val)
+        value = self.visit(node.value)
+        if value.__class__ is Completion:
+            return value
+        return Completion(ReturnException, value)
 
     def _evaluate_arguments(self, arg_nodes):
         pos_args = []
@@ -1366,28 +1642,10 @@ class Interpreter:
             prev_env = self.env
             closure_env = getattr(func, 'closure', self.global_env)
             new_env = Environment(closure_env)
-            f_params = func.params
-            
-            if isinstance(func, LambdaExpr):
-                f_params = [(p, None) for p in f_params]
-
             pos_args, kw_args = self._evaluate_arguments(node.args)
-
-            if len(pos_args) > len(f_params):
-                raise lunite_error("Function", f"Too many positional arguments", node.line, node.col)
-
-            for i, (p_name, p_default) in enumerate(f_params):
-                if i < len(pos_args):
-                    if p_name in kw_args:
-                        raise lunite_error("Function", f"Multiple values for argument '{p_name}'", node.line, node.col)
-                    new_env.define(p_name, pos_args[i])
-                elif p_name in kw_args:
-                    new_env.define(p_name, kw_args[p_name])
-                elif p_default is not None:
-                    val = self.visit(p_default)
-                    new_env.define(p_name, val)
-                else:
-                    raise lunite_error("Function", f"Missing argument for '{p_name}'", node.line, node.col)
+            ArgumentBinder.of(func).bind(self, new_env, pos_args, kw_args, FUNCTION_ARGS, node.line, node.col)
+            if node.tail_call and func.__class__ is FunctionDef:
+                return Completion(TailCallException, (func, new_env))
             
             old_file = constants.CURRENT_FILE
             if hasattr(func, 'source_file'): constants.CURRENT_FILE = func.source_file
@@ -1395,15 +1653,13 @@ class Interpreter:
             self.env = new_env
             try:
                 if isinstance(func.body, Block):
-                    self.visit(func.body)
-                else:
-                    return self.visit(func.body)
+                    return self._function_result(self.visit(func.body))
+                return self.visit(func.body)
             except ReturnException as e:
                 return e.value
             finally:
                 self.env = prev_env
                 constants.CURRENT_FILE = old_file
-            return None
         
         if callable(func):
             try:
@@ -1439,47 +1695,71 @@ class Interpreter:
         
         if isinstance(val, LuniteInstance):
             if isinstance(target, Identifier):
-                curr_def = val.mold
-                while curr_def:
-                    if curr_def.name == type_name:
-                        return True
-                    
-                    if curr_def.superclass:
-                        curr_def = self.env.get(curr_def.superclass, node.line, node.col)
-                        if not isinstance(curr_def, ClassDef):
-                            break
-                    else:
-                        break
+                return type_name in self._class_table(val.mold).names
                 
         return False
 
-    def _resolve_class_members(self, class_def):
-        members = {'fields': {}, 'methods': {}}
-        
+    def _chain_is_current(self, table):
+        # Superclasses are looked up by name from the current scope, so a
+        # cached chain only holds while each name still finds the same class
+        ancestors = table.ancestors
+        for i in range(len(ancestors) - 1, 0, -1):
+            name = ancestors[i].superclass
+            current = self.env
+            while current is not None and name not in current.values:
+                current = current.parent
+            if current is None or current.values[name] is not ancestors[i - 1]:
+                return False
+        return True
+
+    def _class_table(self, class_def):
+        entry = self.class_tables.get(id(class_def))
+        if entry is not None and entry.mold is class_def and self._chain_is_current(entry):
+            return entry
+
         if class_def.superclass:
             super_node = self.env.get(class_def.superclass, class_def.line, class_def.col)
-            if isinstance(super_node, ClassDef):
-                super_members = self._resolve_class_members(super_node)
-                members['fields'].update(super_members['fields'])
-                members['methods'].update(super_members['methods'])
-            else:
+            if not isinstance(super_node, ClassDef):
                 raise lunite_error("Class", f"Superclass {class_def.superclass} is not a valid class", class_def.line, class_def.col)
+            parent = self._class_table(super_node)
+            ancestors = parent.ancestors + [class_def]
+            methods = dict(parent.methods)
+            initialisers = list(parent.initialisers)
+        else:
+            ancestors, methods, initialisers = [class_def], {}, []
 
-        prev_env = self.env
-        class_env = Environment(self.global_env)
-        self.env = class_env
-        
+        own = []
         for stmt in class_def.body.statements:
             if isinstance(stmt, FunctionDef):
-                members['methods'][stmt.name] = stmt
-            elif isinstance(stmt, VarDecl):
-                self.visit(stmt)
-                members['fields'][stmt.name] = class_env.values[stmt.name]
+                methods[stmt.name] = stmt
             else:
-                self.visit(stmt)
+                own.append(stmt)
+        if own:
+            initialisers.append(own)
 
-        self.env = prev_env
-        return members
+        table = ClassTable(class_def, ancestors, methods, initialisers)
+        self.class_tables[id(class_def)] = table
+        return table
+
+    def _init_fields(self, instance, table):
+        # Field values are built per instance, each class body in a scope of
+        # its own, so mutable defaults are never shared
+        if not table.initialisers:
+            return
+
+        prev_env = self.env
+        try:
+            for statements in table.initialisers:
+                class_env = Environment(self.global_env)
+                self.env = class_env
+                for stmt in statements:
+                    if isinstance(stmt, VarDecl):
+                        self.visit(stmt)
+                        instance.set(stmt.name, class_env.values[stmt.name])
+                    else:
+                        self.execute(stmt)
+        finally:
+            self.env = prev_env
     
     def visit_NewInstance(self, node):
         cls_def = self.visit(node.class_expr)
@@ -1490,10 +1770,9 @@ class Interpreter:
             elif isinstance(node.class_expr, MemberAccess): name_hint = node.class_expr.member_name
             raise lunite_error("Class", f"'{name_hint}' is not a class", node.line, node.col)
         
-        instance = LuniteInstance(cls_def)
-        members = self._resolve_class_members(cls_def)
-        instance.fields = members['fields']
-        instance.methods = members['methods']
+        table = self._class_table(cls_def)
+        instance = LuniteInstance(cls_def, table.methods)
+        self._init_fields(instance, table)
         
         if 'init' in instance.methods:
             init_method = instance.methods['init']
@@ -1502,25 +1781,11 @@ class Interpreter:
             method_env.define('this', instance)
             
             pos_args, kw_args = self._evaluate_arguments(node.args)
-            
-            if len(pos_args) > len(init_method.params):
-                raise lunite_error("Class", "Too many constructor arguments", node.line, node.col)
-
-            for i, (p_name, p_default) in enumerate(init_method.params):
-                if i < len(pos_args):
-                    if p_name in kw_args: raise lunite_error("Class", f"Multiple values for '{p_name}'", node.line, node.col)
-                    method_env.define(p_name, pos_args[i])
-                elif p_name in kw_args:
-                    method_env.define(p_name, kw_args[p_name])
-                elif p_default is not None:
-                    val = self.visit(p_default)
-                    method_env.define(p_name, val)
-                else:
-                    raise lunite_error("Class", f"Missing constructor argument '{p_name}'", node.line, node.col)
+            ArgumentBinder.of(init_method).bind(self, method_env, pos_args, kw_args, CONSTRUCTOR_ARGS, node.line, node.col)
 
             self.env = method_env
             try:
-                self.visit(init_method.body)
+                self._function_result(self.visit(init_method.body))
             except ReturnException:
                 pass
             finally:
@@ -1530,6 +1795,14 @@ class Interpreter:
     
     def visit_MethodCall(self, node):
         obj = self.visit(node.obj)
+
+        # The methods mapping is replaced whenever its class table is rebuilt,
+        # so its identity stands for the receiver's class and version
+        cache = node.inline_cache
+        if cache is not None and obj.__class__ is LuniteInstance and obj.methods is cache[0]:
+            if self.debug:
+                self.inline_cache_stats['hits'] += 1
+            return self._invoke_method(obj, cache[1], node)
         
         if isinstance(obj, list):
             if node.method_name == 'map':
@@ -1565,45 +1838,13 @@ class Interpreter:
                 return obj.get(key, default)
         
         if isinstance(obj, LuniteInstance):
+            if self.debug:
+                self.inline_cache_stats['misses'] += 1
             method = obj.methods.get(node.method_name)
 
             if method and isinstance(method, FunctionDef):
-                prev_env = self.env
-                method_env = Environment(self.global_env)
-                method_env.define('this', obj)
-                
-                pos_args, kw_args = self._evaluate_arguments(node.args)
-
-                if len(pos_args) > len(method.params):
-                     raise lunite_error("Method", f"Too many positional arguments for '{node.method_name}'", node.line, node.col)
-
-                for i, (p_name, p_default) in enumerate(method.params):
-                    if i < len(pos_args):
-                        if p_name in kw_args: raise lunite_error("Method", f"Multiple values for '{p_name}'", node.line, node.col)
-                        method_env.define(p_name, pos_args[i])
-                    elif p_name in kw_args:
-                        method_env.define(p_name, kw_args[p_name])
-                    elif p_default is not None:
-                        val = self.visit(p_default)
-                        method_env.define(p_name, val)
-                    else:
-                        raise lunite_error("Method", f"Missing argument for '{p_name}'", node.line, node.col)
-
-                old_file = constants.CURRENT_FILE
-                if hasattr(method, 'source_file'):
-                    constants.CURRENT_FILE = method.source_file
-                elif hasattr(obj.mold, 'source_file'):
-                    constants.CURRENT_FILE = obj.mold.source_file
-
-                self.env = method_env
-                try:
-                    self.visit(method.body)
-                except ReturnException as e:
-                    return e.value
-                finally:
-                    self.env = prev_env
-                    constants.CURRENT_FILE = old_file
-                return None
+                node.inline_cache = (obj.methods, method)
+                return self._invoke_method(obj, method, node)
 
             if method and callable(method):
                 try:
@@ -1612,7 +1853,7 @@ class Interpreter:
                 except Exception as e:
                      raise lunite_error("Method", str(e), node.line, node.col)
 
-            field = obj.fields.get(node.method_name)
+            field = obj.get_field(node.method_name)
             if field and callable(field):
                 try:
                     pos_args, kw_args = self._evaluate_arguments(node.args)
@@ -1635,9 +1876,39 @@ class Interpreter:
         
         raise lunite_error("Method", f"Method '{node.method_name}' not found on '{type(obj).__name__}'", node.line, node.col)
 
+    def _invoke_method(self, obj, method, node):
+        prev_env = self.env
+        method_env = Environment(self.global_env)
+        method_env.define('this', obj)
+
+        pos_args, kw_args = self._evaluate_arguments(node.args)
+        ArgumentBinder.of(method).bind(self, method_env, pos_args, kw_args, METHOD_ARGS, node.line, node.col, node.method_name)
+
+        old_file = constants.CURRENT_FILE
+        if hasattr(method, 'source_file'):
+            constants.CURRENT_FILE = method.source_file
+        elif hasattr(obj.mold, 'source_file'):
+            constants.CURRENT_FILE = obj.mold.source_file
+
+        self.env = method_env
+        try:
+            return self._function_result(self.visit(method.body))
+        except ReturnException as e:
+            return e.value
+        finally:
+            self.env = prev_env
+            constants.CURRENT_FILE = old_file
+
     def visit_MemberAccess(self, node):
         obj = self.visit(node.obj)
 
+        # Shapes never change once made, so the same shape means the same slot
+        cache = node.inline_cache
+        if cache is not None and obj.__class__ is LuniteInstance and obj.shape is cache[0]:
+            if self.debug:
+                self.inline_cache_stats['hits'] += 1
+            return obj.values[cache[1]]
+
         if isinstance(obj, (FunctionDef, LambdaExpr)):
             if node.member_name == 'name':
                 return getattr(obj, 'name', 'anonymous')
@@ -1646,6 +1917,12 @@ class Interpreter:
             if node.member_name == 'is_lambda':
                 return isinstance(obj, LambdaExpr)
         if isinstance(obj, LuniteInstance):
+            if self.debug:
+                self.inline_cache_stats['misses'] += 1
+            index = obj.shape.slots.get(node.member_name)
+            if index is not None:
+                node.inline_cache = (obj.shape, index)
+                return obj.values[index]
             return obj.get(node.member_name, node.line, node.col)
         
         try:
@@ -1736,7 +2013,7 @@ class Interpreter:
     def visit_EnumDef(self, node):
         enum_val = LuniteInstance(ClassDef(node.name, Block([]), None))
         for i, member in enumerate(node.members):
-            enum_val.fields[member] = i
+            enum_val.set(member, i)
         self.env.define(node.name, enum_val, is_const=True)
         return enum_val
     
@@ -0,0 +1,195 @@
+# Profiler
+# --------
+
+import os
+import time
+
+from core.ast import *
+from core.optimizer import child_fields
+import core.constants as constants
+from runtime.interpreter import Interpreter
+from runtime.closures import ClosureInterpreter, get_interpreter_class
+
+# ==========================================
+# PROFILE DATA
+# ==========================================
+
+# Deterministic: every statement and every function body is timed as it
+# starts and finishes. Statements are counted per source line and bodies per
+# definition. Self time is total time less that of nested frames of the same
+# kind, so a line's self time leaves out the lines of functions it calls.
+# A recursive frame adds to its total only once, at the outermost call.
+
+class Profiler:
+    def __init__(self):
+        self.functions = {}   # (name, file, line) -> [calls, total, self]
+        self.lines = {}       # (file, line) -> [hits, total, self]
+        self.stacks = {}      # "outer;inner" -> self time, for flame graphs
+        self.function_frames = []
+        self.line_frames = []
+        self.active = {}
+
+    def enter(self, kind, key):
+        active = self.active
+        active[key] = active.get(key, 0) + 1
+        if kind == 'line':
+            self.line_frames.append([key, 0.0, time.perf_counter()])
+            return
+        frames = self.function_frames
+        path = key[0] if not frames else f"{frames[-1][3]};{key[0]}"
+        frames.append([key, 0.0, time.perf_counter(), path])
+
+    def exit(self, kind):
+        now = time.perf_counter()
+        if kind == 'line':
+            frames, table = self.line_frames, self.lines
+        else:
+            frames, table = self.function_frames, self.functions
+        frame = frames.pop()
+        key, nested = frame[0], frame[1]
+        elapsed = now - frame[2]
+
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[2] += elapsed - nested
+        self.active[key] -= 1
+        if not self.active[key]:
+            entry[1] += elapsed
+        if frames:
+            frames[-1][1] += elapsed
+        if kind != 'line':
+            self.stacks[frame[3]] = self.stacks.get(frame[3], 0.0) + elapsed - nested
+
+    def timed(self, fn, kind, key):
+        # A compiled closure that is timed like a visit
+        enter, exit = self.enter, self.exit
+        def run():
+            enter(kind, key)
+            try:
+                return fn()
+            finally:
+                exit(kind)
+        return run
+
+    # ==========================================
+    # REPORTS
+    # ==========================================
+
+    def report(self, limit=20):
+        def where(file, line):
+            return f"{os.path.basename(file)}:{line}"
+
+        out = []
+        functions = sorted(self.functions.items(), key=lambda item: item[1][2], reverse=True)
+        out.append(f"{'Function':<40} {'Calls':>10} {'Total ms':>12} {'Self ms':>12}")
+        for (name, file, line), (calls, total, own) in functions[:limit]:
+            label = f"{name} ({where(file, line)})" if line else name
+            out.append(f"{label:<40} {calls:>10} {total * 1000:>12.2f} {own * 1000:>12.2f}")
+
+        lines = sorted(self.lines.items(), key=lambda item: item[1][2], reverse=True)
+        out.append("")
+        out.append(f"{'Line':<40} {'Hits':>10} {'Total ms':>12} {'Self ms':>12}")
+        for (file, line), (hits, total, own) in lines[:limit]:
+            out.append(f"{where(file, line):<40} {hits:>10} {total * 1000:>12.2f} {own * 1000:>12.2f}")
+        return "\n".join(out)
+
+    def write_collapsed(self, path):
+        # One "outer;inner microseconds" line per call stack, the format
+        # flamegraph.pl, speedscope and inferno read
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                micros = round(seconds * 1_000_000)
+                if micros:
+                    f.write(f"{stack} {micros}\n")
+        return path
+
+# ==========================================
+# PROFILING INTERPRETERS
+# ==========================================
+
+# Subclasses of the engines, used only by `lunite profile`. Each program or
+# module run through execute() is walked once for the nodes worth timing:
+# the statements of every block and the body of every function.
+
+class ProfilingMixin:
+    def __init__(self, *args, profiler=None, **kwargs):
+        self.profiler = profiler if profiler is not None else Profiler()
+        # id(node) -> (node, kind, key); the node is kept so its id stays unique
+        self.profile_points = {}
+        super().__init__(*args, **kwargs)
+
+    def execute(self, node):
+        self.find_profile_points(node)
+        frames = self.profiler.function_frames
+        name = "<main>" if not frames else f"<module {os.path.basename(constants.CURRENT_FILE)}>"
+        self.profiler.enter('function', (name, constants.CURRENT_FILE, 0))
+        try:
+            return super().execute(node)
+        finally:
+            self.profiler.exit('function')
+
+    def find_profile_points(self, root):
+        file = constants.CURRENT_FILE
+        points = self.profile_points
+        pending = [(root, None)]
+        while pending:
+            node, owner = pending.pop()
+            cls = node.__class__
+            if cls is Block:
+                for stmt in node.statements:
+                    if isinstance(stmt, AST):
+                        points[id(stmt)] = (stmt, 'line', (file, stmt.line))
+            elif cls is FunctionDef or cls is AsyncFuncDef:
+                name = f"{owner}.{node.name}" if owner else node.name
+                points[id(node.body)] = (node.body, 'function', (name, file, node.line))
+            elif cls is LambdaExpr:
+                points[id(node.body)] = (node.body, 'function', ("<lambda>", file, node.line))
+            elif cls is ClassDef:
+                owner = node.name
+
+            for name in child_fields(cls):
+                value = getattr(node, name)
+                if isinstance(value, AST):
+                    pending.append((value, owner))
+                elif isinstance(value, (list, tuple)):
+                    for item in value:
+                        if isinstance(item, AST):
+                            pending.append((item, owner))
+                        elif isinstance(item, (list, tuple)):
+                            pending.extend((part, owner) for part in item if isinstance(part, AST))
+
+class ProfilingInterpreter(ProfilingMixin, Interpreter):
+    def visit(self, node):
+        point = self.profile_points.get(id(node))
+        if point is None:
+            return Interpreter.visit(self, node)
+        profiler = self.profiler
+        profiler.enter(point[1], point[2])
+        try:
+            return Interpreter.visit(self, node)
+        finally:
+            profiler.exit(point[1])
+
+class ProfilingClosureInterpreter(ProfilingMixin, ClosureInterpreter):
+    def compile(self, node):
+        entry = self.closures.get(id(node))
+        if entry is not None:
+            return entry[1]
+
+        fn = super().compile(node)
+        point = self.profile_points.get(id(node))
+        if point is not None:
+            fn = self.profiler.timed(fn, point[1], point[2])
+            self.closures[id(node)] = (node, fn)
+        return fn
+
+PROFILING_ENGINES = {
+    'visitor': ProfilingInterpreter,
+    'closure': ProfilingClosureInterpreter,
+}
+
+def get_profiling_class(engine='visitor'):
+    get_interpreter_class(engine)
+    return PROFILING_ENGINES[engine]
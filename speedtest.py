@@ -33,6 +33,32 @@ def benchmark_import(iterations=10):
     print(f"{Fore.YELLOW}Worst  : {max_time:.4f} ms{Style.RESET_ALL}")
     print("")
 
+def check_lexer_backends():
+    print(f"{Fore.CYAN}[ Lexer Backend Equality ]{Style.RESET_ALL}")
+
+    import glob
+    import lunite
+
+    files = sorted(glob.glob("demos/*.luna") + glob.glob("lib/*.luna"))
+    mismatches = 0
+
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        streams = []
+        for backend in lunite.LEXER_BACKENDS:
+            lexer = lunite.get_lexer_class(backend)(code)
+            streams.append([(t.type, t.value, t.line, t.col) for t in lexer])
+        if any(stream != streams[0] for stream in streams[1:]):
+            mismatches += 1
+            print(f"{Fore.RED}Mismatch: {path}{Style.RESET_ALL}")
+
+    if mismatches:
+        print(f"{Fore.RED}{mismatches} of {len(files)} files lex differently{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.GREEN}All {len(files)} demo and lib files produce identical tokens{Style.RESET_ALL}")
+    print("")
+
 def benchmark_lexer(iterations=20):
     print(f"{Fore.CYAN}[ Lexer Throughput ({iterations} runs) ]{Style.RESET_ALL}")
     
@@ -44,29 +70,1101 @@ def benchmark_lexer(iterations=20):
     """ * 1000
 
     import lunite
-    
+
+    print(f"{Fore.BLUE}Source Size : {len(code) / 1024:.2f} KB (Generated){Style.RESET_ALL}")
+    speeds = {}
+
+    for backend in lunite.LEXER_BACKENDS:
+        lexer_cls = lunite.get_lexer_class(backend)
+        times = []
+        token_count = 0
+
+        for _ in tqdm(range(iterations), desc=f"Lexing ({backend})", colour="cyan"):
+            start = time.perf_counter()
+            
+            count = 0
+            for _ in lexer_cls(code):
+                count += 1
+            
+            end = time.perf_counter()
+            times.append((end - start) * 1000)
+            token_count = count
+
+        avg_time = sum(times) / len(times)
+        speeds[backend] = token_count / (avg_time / 1000)
+        print(f"{Fore.BLUE}[{backend}] Token Count : {token_count} tokens{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}[{backend}] Average Time: {avg_time:.4f} ms{Style.RESET_ALL}")
+        print(f"{Fore.MAGENTA}[{backend}] Speed       : {speeds[backend]:.0f} tokens/sec{Style.RESET_ALL}")
+
+    for backend in speeds:
+        if backend != 'classic':
+            print(f"{Fore.YELLOW}{backend.capitalize()} backend speedup: {speeds[backend] / speeds['classic']:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def make_descent_parser():
+    import lunite
+
+    class DescentParser(lunite.Parser):
+        # The previous expression parser: one method per precedence level
+        def binary_expr(self, min_prec=None):
+            return self.logic_expr()
+
+        def _left_assoc(self, operand, types):
+            node = operand()
+            while self.current_token.type in types:
+                token = self.current_token
+                self.eat(token.type)
+                node = lunite.BinaryOp(left=node, op=token, right=operand())
+                node.line = token.line
+                node.col = token.col
+            return node
+
+        def term(self):
+            return self._left_assoc(self.factor, (lunite.TOKEN_MUL, lunite.TOKEN_DIV, lunite.TOKEN_MOD))
+
+        def math_expr(self):
+            return self._left_assoc(self.term, (lunite.TOKEN_PLUS, lunite.TOKEN_MINUS, lunite.TOKEN_EQ, lunite.TOKEN_NEQ,
+                                                lunite.TOKEN_GT, lunite.TOKEN_LT, lunite.TOKEN_GE, lunite.TOKEN_LE))
+
+        def shift_expr(self):
+            return self._left_assoc(self.math_expr, (lunite.TOKEN_LSHIFT, lunite.TOKEN_RSHIFT))
+
+        def bitwise_and_expr(self):
+            return self._left_assoc(self.shift_expr, (lunite.TOKEN_BIT_AND,))
+
+        def bitwise_xor_expr(self):
+            return self._left_assoc(self.bitwise_and_expr, (lunite.TOKEN_BIT_XOR,))
+
+        def bitwise_or_expr(self):
+            return self._left_assoc(self.bitwise_xor_expr, (lunite.TOKEN_BIT_OR,))
+
+        def comp_expr(self):
+            node = self.bitwise_or_expr()
+            while self.current_token.type in (lunite.TOKEN_IS, lunite.TOKEN_KEYWORD):
+                token = self.current_token
+                if token.type == lunite.TOKEN_KEYWORD and token.value != 'in':
+                    break
+                self.eat(token.type)
+                if token.type == lunite.TOKEN_IS:
+                    node = lunite.TypeCheckOp(node, self.bitwise_or_expr())
+                else:
+                    node = lunite.BinaryOp(left=node, op=token, right=self.bitwise_or_expr())
+                node.line = token.line
+                node.col = token.col
+            return node
+
+        def logic_expr(self):
+            return self._left_assoc(self.comp_expr, (lunite.TOKEN_AND, lunite.TOKEN_OR))
+
+    return DescentParser
+
+def check_parser_equality():
+    print(f"{Fore.CYAN}[ Expression Parser AST Equality ]{Style.RESET_ALL}")
+
+    import glob
+    import lunite
+
+    DescentParser = make_descent_parser()
+    files = sorted(glob.glob("demos/*.luna") + glob.glob("lib/*.luna"))
+    mismatches = 0
+
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            code = lunite.Preprocessor().process(f.read())
+        try:
+            expected = repr(DescentParser(lunite.TokenStream(code)).parse())
+        except Exception as e:
+            expected = str(e)
+        try:
+            actual = repr(lunite.Parser(lunite.TokenStream(code)).parse())
+        except Exception as e:
+            actual = str(e)
+        if actual != expected:
+            mismatches += 1
+            print(f"{Fore.RED}Mismatch: {path}{Style.RESET_ALL}")
+
+    if mismatches:
+        print(f"{Fore.RED}{mismatches} of {len(files)} files parse differently{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.GREEN}All {len(files)} demo and lib files produce identical ASTs{Style.RESET_ALL}")
+    print("")
+
+def benchmark_parser(iterations=10):
+    print(f"{Fore.CYAN}[ Parser Throughput ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import lunite
+
+    code = '''
+    let total = a + b * c - d / 2 % 3;
+    let flag = x == 1 and y != 2 or not z;
+    let bits = (mask & 255) | (value << 2) ^ flags;
+    if (count > 10 and name is str) { out(items[1] + obj.field.value); }
+    let picked = ready ? left : right;
+    ''' * 500
+
+    tokens = list(lunite.TokenStream(code))
+    print(f"{Fore.BLUE}Token Count : {len(tokens)} tokens{Style.RESET_ALL}")
+    speeds = {}
+
+    for label, parser_cls in (("descent", make_descent_parser()), ("pratt", lunite.Parser)):
+        times = []
+        for _ in tqdm(range(iterations), desc=f"Parsing ({label})", colour="cyan"):
+            start = time.perf_counter()
+            parser_cls(tokens).parse()
+            times.append(time.perf_counter() - start)
+
+        best = min(times)
+        speeds[label] = len(tokens) / best
+        print(f"{Fore.GREEN}[{label}] Best Time : {best * 1000:.2f} ms{Style.RESET_ALL}")
+        print(f"{Fore.MAGENTA}[{label}] Speed     : {speeds[label]:.0f} tokens/sec{Style.RESET_ALL}")
+
+    print(f"{Fore.YELLOW}Pratt parser speedup: {speeds['pratt'] / speeds['descent']:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def benchmark_preprocessor(macro_count=200, size=1024 * 1024):
+    print(f"{Fore.CYAN}[ Macro Expansion ({macro_count} macros) ]{Style.RESET_ALL}")
+
+    import re
+    from core.preprocessor import Preprocessor
+
+    def per_macro_process(source):
+        # The previous engine: one full re.sub over the source per macro
+        macros = {}
+        macro_regex = re.compile(r'macro\s+([a-zA-Z_]\w*)\s*(?:\((.*?)\))?\s*(?:\{([\s\S]*?)\}|=\s*(.*))')
+
+        def make_macro(match):
+            params = [p.strip() for p in match.group(2).split(',')] if match.group(2) else []
+            macros[match.group(1)] = (params, (match.group(3) or match.group(4)).strip())
+            return ""
+
+        clean_source = macro_regex.sub(make_macro, source)
+        for name in sorted(macros, key=len, reverse=True):
+            params, body = macros[name]
+            if not params:
+                clean_source = re.sub(rf'\b{name}\b', body, clean_source)
+            else:
+                def replace_func_macro(m, params=params, body=body):
+                    args = [a.strip() for a in m.group(1).split(',')]
+                    for i, p_name in enumerate(params):
+                        if i < len(args):
+                            body = body.replace(p_name, f"({args[i]})")
+                    return body
+                clean_source = re.sub(rf'\b{name}\s*\((.*?)\)', replace_func_macro, clean_source)
+        return clean_source
+
+    definitions = []
+    for i in range(macro_count):
+        if i % 4 == 0:
+            definitions.append(f"macro SCALE_{i}(v) = v * {i}")
+        else:
+            definitions.append(f"macro CONST_{i} = {i}")
+
+    # Interpolations are code, so macros expand inside {...} but not in the
+    # literal text around them
+    cases = {
+        'macro PI = 3\nout(f"{PI}")': '\nout(f"{3}")',
+        'macro PI = 3\nout(f"PI={PI} \\" PI")': '\nout(f"PI={3} \\" PI")',
+        'macro SQ(x) = x * x\nout(f"{f"{SQ(2)}"} SQ(2)")': '\nout(f"{f"{(2) * (2)}"} SQ(2)")',
+        'macro PI = 3\nout("{PI}") ~~ PI': '\nout("{PI}") ~~ PI',
+    }
+    failures = [source for source, expected in cases.items() if Preprocessor().process(source) != expected]
+    for source in failures:
+        print(f"{Fore.RED}Mismatch: {source!r}{Style.RESET_ALL}")
+    if not failures:
+        print(f"{Fore.GREEN}All {len(cases)} string and f-string cases expand as expected{Style.RESET_ALL}")
+
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        if i % 50 == 0:
+            line = f'out(f"CONST_1 is {{CONST_{i % macro_count | 1}}} and {{SCALE_0({i})}}")\n'
+        else:
+            line = f"let value_{i} = CONST_{i % macro_count | 1} + SCALE_{(i % (macro_count // 4)) * 4}(value_{i // 2}); ~~ CONST_1\n"
+        lines.append(line)
+        total += len(line)
+        i += 1
+    code = "\n".join(definitions) + "\n" + "".join(lines)
+
+    print(f"{Fore.BLUE}Source Size : {len(code) / 1024:.2f} KB (Generated){Style.RESET_ALL}")
+
+    start = time.perf_counter()
+    per_macro_process(code)
+    per_macro_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Preprocessor().process(code)
+    single_pass_time = time.perf_counter() - start
+
+    print(f"{Fore.GREEN}Per-macro passes : {per_macro_time * 1000:.2f} ms{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}Single pass      : {single_pass_time * 1000:.2f} ms{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Speedup          : {per_macro_time / single_pass_time:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def benchmark_token_storage(lines=10000):
+    print(f"{Fore.CYAN}[ Token Storage ({lines} lines) ]{Style.RESET_ALL}")
+
+    import tracemalloc
+    import lunite
+
+    block = '''let x_{i} = {i} + 0.5 * y;
+func calc_{i}(a, b) {{ return a + b * "text"; }} ~~ comment
+'''
+    code = ''.join(block.format(i=i) for i in range(lines // 2))
+    print(f"{Fore.BLUE}Source Size : {len(code) / 1024:.2f} KB (Generated){Style.RESET_ALL}")
+
+    variants = (
+        ("Token list", lambda: list(lunite.Lexer(code))),
+        ("TokenStream", lambda: lunite.TokenStream(code)),
+    )
+
+    for label, build in variants:
+        start = time.perf_counter()
+        tokens = build()
+        lex_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lunite.Parser(tokens).parse()
+        parse_time = time.perf_counter() - start
+        del tokens
+
+        tracemalloc.start()
+        tokens = build()
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{Fore.BLUE}[{label}] Tokens : {len(tokens)}{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}[{label}] Memory : {held / 1024:.0f} KB ({held / len(tokens):.1f} bytes/token){Style.RESET_ALL}")
+        print(f"{Fore.MAGENTA}[{label}] Lex    : {lex_time * 1000:.2f} ms ({len(tokens) / lex_time:.0f} tokens/sec){Style.RESET_ALL}")
+        print(f"{Fore.MAGENTA}[{label}] Parse  : {parse_time * 1000:.2f} ms{Style.RESET_ALL}")
+        del tokens
+
+    print("")
+
+def benchmark_streaming(sizes=(2000, 8000, 32000)):
+    print(f"{Fore.CYAN}[ Streaming Parse Memory ]{Style.RESET_ALL}")
+
+    import mmap
+    import tempfile
+    import tracemalloc
+    import lunite
+
+    line = 'let total = total + calculate(3, 4) * 2; ~~ generated line\n'
+
+    def parse_in_memory(path):
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        tokens = list(lunite.Lexer(code))
+        return lunite.Parser(tokens).parse()
+
+    def parse_streaming(path):
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return lunite.Parser(lunite.StreamLexer(mm)).parse()
+
+    for size in sizes:
+        fd, path = tempfile.mkstemp(suffix=".luna")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("let total = 0;\n" + line * size)
+
+        try:
+            print(f"{Fore.BLUE}Source Size : {os.path.getsize(path) / 1024:.2f} KB ({size} lines){Style.RESET_ALL}")
+            for label, parse in (("in-memory", parse_in_memory), ("streaming", parse_streaming)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                ast = parse(path)
+                end = time.perf_counter()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del ast
+                print(f"{Fore.GREEN}[{label}] Peak: {peak / 1024:.0f} KB, Time: {(end - start) * 1000:.2f} ms{Style.RESET_ALL}")
+        finally:
+            os.remove(path)
+
+    print("")
+
+def benchmark_ast_cache(iterations=5):
+    print(f"{Fore.CYAN}[ AST Cache Cold vs Warm ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import glob
+    import shutil
+    import lunite
+
+    files = sorted(glob.glob("lib/*.luna"))
+    shutil.rmtree(os.path.join("lib", lunite.AST_CACHE_DIR), ignore_errors=True)
+
+    def parse_all():
+        for path in files:
+            with open(path, "r", encoding="utf-8") as f:
+                lunite.Parser(lunite.StreamLexer(f)).parse()
+
+    def load_all():
+        for path in files:
+            if lunite.load_ast(path, preprocessed=False) is None:
+                with open(path, "r", encoding="utf-8") as f:
+                    lunite.store_ast(path, lunite.Parser(lunite.StreamLexer(f)).parse(), preprocessed=False)
+
+    load_all()
+    for label, work in (("Lex + parse", parse_all), ("Cache load", load_all)):
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            work()
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{Fore.GREEN}{label:<12}: {min(times):.2f} ms for {len(files)} lib modules{Style.RESET_ALL}")
+
+    stats = lunite.AST_CACHE_STATS
+    print(f"{Fore.BLUE}Cache hits {stats['hits']}, misses {stats['misses']}{Style.RESET_ALL}")
+    print("")
+
+def benchmark_optimizer(iterations=3, loops=20000):
+    print(f"{Fore.CYAN}[ AST Optimizer -O0 vs -O1 ({loops} loop iterations) ]{Style.RESET_ALL}")
+
+    import lunite
+
+    code = f"""
+macro SCALE = 4 * 1024
+macro VERBOSE = false
+let total = 0
+let i = 0
+while (i < {loops}) {{
+    total = total + SCALE / 2 + (true ? 1 : 0) - (1 < 2 and 3 > 2 ? 1 : 0)
+    if (VERBOSE) {{ out("tick " + "tock") }}
+    i = i + 1
+}}
+"""
+
+    results = {}
+    for level in (0, 1):
+        lunite.constants.OPT_LEVEL = level
+        times = []
+        for _ in range(iterations):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                lunite.run_code(code)
+                times.append((time.perf_counter() - start) * 1000)
+        results[level] = min(times)
+        print(f"{Fore.GREEN}-O{level}: {results[level]:.2f} ms{Style.RESET_ALL}")
+    lunite.constants.OPT_LEVEL = 1
+
+    print(f"{Fore.BLUE}Speedup: {results[0] / results[1]:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def benchmark_scope_elision(items=50000):
+    print(f"{Fore.CYAN}[ Scope Elision: Environments per {items} Loop Iterations ]{Style.RESET_ALL}")
+
+    import tracemalloc
+    import lunite
+    from core import optimizer
+    import runtime.interpreter as interpreter_module
+
+    code = f"""
+let total = 0
+for i in range(1, {items}) {{
+    if (i % 2 == 0) {{ total += i }} else {{ total -= 1 }}
+}}
+let n = 0
+while (n < {items}) {{
+    let step = 1
+    n += step
+}}
+out(total)
+"""
+
+    Environment = interpreter_module.Environment
+    created = [0]
+    class CountingEnvironment(Environment):
+        __slots__ = ()
+        def __init__(self, parent=None):
+            created[0] += 1
+            super().__init__(parent)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    sample = [Environment() for _ in range(1000)]
+    env_size = (tracemalloc.get_traced_memory()[0] - base) / len(sample)
+    del sample
+    tracemalloc.stop()
+
+    results = {}
+    for label, elide in (("Per-block", False), ("Elided", True)):
+        passes = optimizer.OPTIMIZATION_PASSES
+        if not elide:
+            optimizer.OPTIMIZATION_PASSES = [p for p in passes if p is not optimizer.ScopeElision]
+        interpreter_module.Environment = CountingEnvironment
+        created[0] = 0
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                lunite.run_code(code)
+                elapsed = (time.perf_counter() - start) * 1000
+            count = created[0]
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                lunite.run_code(code)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            optimizer.OPTIMIZATION_PASSES = passes
+            interpreter_module.Environment = Environment
+        results[label] = count
+        print(f"{Fore.GREEN}{label:<9}: {count} environments (~{count * env_size / 1024 / 1024:.2f} MB allocated), peak {peak / 1024:.0f} KB, {elapsed:.2f} ms{Style.RESET_ALL}")
+
+    print(f"{Fore.BLUE}Environment size: {env_size:.0f} bytes, {results['Per-block'] - results['Elided']} fewer allocated{Style.RESET_ALL}")
+    print("")
+
+def benchmark_environment_memory(scopes=10000, n=20):
+    print(f"{Fore.CYAN}[ Environment Memory: Call Scopes ]{Style.RESET_ALL}")
+
+    import tracemalloc
+    import lunite
+    from runtime.environment import Environment
+
+    # What a live call costs: a scope holding three parameters and a local
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    held = []
+    for i in range(scopes):
+        env = Environment()
+        env.define('a', i)
+        env.define('b', i)
+        env.define('c', i)
+        env.define('total', i)
+        held.append(env)
+    per_scope = (tracemalloc.get_traced_memory()[0] - base) / scopes
+    del held
+    tracemalloc.stop()
+    print(f"{Fore.GREEN}Call scope    : {per_scope:.0f} bytes ({scopes} held){Style.RESET_ALL}")
+
+    code = f"""
+func fib(n) {{
+    if (n <= 1) {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+func depth(n, a, b) {{
+    let total = a + b
+    if (n == 0) {{ return total }}
+    return depth(n - 1, a, b) + 1
+}}
+out(fib({n}) + depth(80, 1, 2))
+"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        lunite.run_code(code)
+        elapsed = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        lunite.run_code(code)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{Fore.GREEN}fib({n}) + depth: peak {peak / 1024:.0f} KB, {elapsed:.2f} ms{Style.RESET_ALL}")
+    print("")
+
+def benchmark_instantiation(obj_count=10000, iterations=3):
+    print(f"{Fore.CYAN}[ Instantiation: {obj_count} objects ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import lunite
+
+    # Superclasses are found by name from the current scope on every `new`,
+    # so rebinding one must reach cached class tables
+    rebinding = {
+        """
+class Base { func who() { return "base" } }
+class Other { func who() { return "other" } }
+class Kid extends Base {}
+out(new Kid().who())
+Base = Other
+let k = new Kid()
+out(k.who())
+out(k is Base)
+""": "base\nother\nfalse",
+        """
+class Base { func who() { return "base" } }
+class Kid extends Base {}
+func f() {
+    class Base { func who() { return "local" } }
+    return new Kid().who()
+}
+out(f())
+out(new Kid().who())
+""": "local\nbase",
+    }
+    failures = 0
+    for code, expected in rebinding.items():
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            lunite.run_code(code)
+        if output.getvalue().strip() != expected:
+            failures += 1
+            print(f"{Fore.RED}Mismatch: {output.getvalue().strip()!r}, expected {expected!r}{Style.RESET_ALL}")
+    if not failures:
+        print(f"{Fore.GREEN}All {len(rebinding)} superclass rebinding cases resolve as expected{Style.RESET_ALL}")
+
+    # Test 3 of demos/stresstest.luna, then the same through a subclass chain
+    vector = """
+class Vector {
+    func init(x, y, z) {
+        this.x = x
+        this.y = y
+        this.z = z
+    }
+    func mag() {
+        return Math.sqrt((this.x * this.x) + (this.y * this.y) + (this.z * this.z))
+    }
+}
+"""
+    cases = {
+        "Vector": "Vector",
+        "3-level": "Vector3",
+    }
+    chain = """
+class Vector2 extends Vector { func twice() { return this.mag() * 2 } }
+class Vector3 extends Vector2 { func thrice() { return this.mag() * 3 } }
+"""
+    for label, cls in cases.items():
+        code = vector + chain + f"""
+let objects = list({obj_count}, "null")
+for i in range(0, {obj_count} - 1) {{
+    objects[i] = new {cls}(i, i+1, i+2)
+    let m = objects[i].mag()
+}}
+out(Math.round(objects[{obj_count}-1].mag()))
+"""
+        times = []
+        for _ in range(iterations):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                lunite.run_code(code)
+                times.append((time.perf_counter() - start) * 1000)
+        print(f"{Fore.GREEN}{label:<8}: {min(times):.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    print("")
+
+def benchmark_instance_layout(count=1000000, wide_fields=3000):
+    print(f"{Fore.CYAN}[ Instance Layout: {count} Instances ]{Style.RESET_ALL}")
+
+    import tracemalloc
+    from core.ast import ClassDef, Block
+    from core.types import LuniteInstance
+
+    # Instances as `new` builds them: shared methods, three fields set in order
+    mold = ClassDef("Vector", Block([]), None)
+    methods = {}
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    instances = []
+    for i in range(count):
+        obj = LuniteInstance(mold)
+        obj.methods = methods
+        obj.set('x', i)
+        obj.set('y', i)
+        obj.set('z', i)
+        instances.append(obj)
+    per_instance = (tracemalloc.get_traced_memory()[0] - base) / count
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    total = 0
+    for obj in instances:
+        total += obj.get('y', 0, 0)
+    access = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for obj in instances:
+        obj.set('y', 0)
+    update = (time.perf_counter() - start) * 1000
+    del instances
+
+    # One object growing many fields, as modules, enums and static libraries do
+    names = [f"field_{i}" for i in range(wide_fields)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    wide = LuniteInstance(mold)
+    for i, name in enumerate(names):
+        wide.set(name, i)
+    wide_time = (time.perf_counter() - start) * 1000
+    wide_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del wide
+
+    print(f"{Fore.GREEN}Memory     : {per_instance:.0f} bytes per instance (incl. list slot), {per_instance * count / 1024 / 1024:.0f} MB total{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}get() x{count}: {access:.2f} ms{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}set() x{count}: {update:.2f} ms{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}{wide_fields} fields on one object: {wide_time:.2f} ms, {wide_peak / 1024:.0f} KB peak{Style.RESET_ALL}")
+    print("")
+
+def benchmark_inline_caches(calls=20000, iterations=3):
+    print(f"{Fore.CYAN}[ Inline Caches: {calls} Method Calls and Field Reads ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import lunite
+    from runtime import interpreter
+
+    code = f"""
+class Point {{
+    func init(x, y) {{
+        this.x = x
+        this.y = y
+    }}
+    func norm2() {{
+        return this.x * this.x + this.y * this.y
+    }}
+    func scaled(k, offset) {{
+        return this.x * k + offset
+    }}
+}}
+let p = new Point(3, 4)
+let total = 0
+for i in range(1, {calls}) {{
+    total += p.norm2() + p.scaled(2, i) + p.x
+}}
+out(total)
+"""
     times = []
-    token_count = 0
+    for _ in range(iterations):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            lunite.run_code(code)
+            times.append((time.perf_counter() - start) * 1000)
+
+    # Only a debug-mode interpreter counts lookups, so take the hit rate from one more run
+    checker = interpreter.Interpreter(debug=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        checker.execute(lunite.optimize(lunite.Parser(lunite.Lexer(code)).parse()))
+    stats = checker.inline_cache_stats
+    lookups = stats['hits'] + stats['misses']
+    print(f"{Fore.GREEN}Best Run : {min(times):.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    if lookups:
+        print(f"{Fore.GREEN}Hit Rate : {stats['hits'] / lookups * 100:.2f}% ({stats['hits']} hits, {stats['misses']} misses){Style.RESET_ALL}")
+    print("")
+
+def benchmark_call_binding(calls=20000, iterations=3):
+    print(f"{Fore.CYAN}[ Argument Binding: {calls} Calls per Shape ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import lunite
+
+    shapes = {
+        "Positional": "add(i, 1, 2)",
+        "Defaults": "add(i)",
+        "Keywords": "add(i, c = 2, b = 1)",
+        "Lambda": "twice(i)",
+    }
+
+    for label, call in shapes.items():
+        code = f"""
+func add(a, b = 1, c = 2) {{
+    return a + b + c
+}}
+let twice = (x) => x * 2
+let total = 0
+for i in range(0, {calls}) {{
+    total += {call}
+}}
+out(total)
+"""
+        for engine in lunite.INTERPRETER_ENGINES:
+            lunite.constants.ENGINE = engine
+            times = []
+            for _ in range(iterations):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    start = time.perf_counter()
+                    lunite.run_code(code)
+                    times.append((time.perf_counter() - start) * 1000)
+            print(f"{Fore.GREEN}{label:<11}({engine:<8}): {min(times):8.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    lunite.constants.ENGINE = "visitor"
+    print("")
+
+def benchmark_engines(n=25, iterations=1):
+    print(f"{Fore.CYAN}[ Visitor vs Closure Engine: fib({n}) ]{Style.RESET_ALL}")
+
+    import lunite
+
+    code = f"""
+func fib(n) {{
+    if (n <= 1) {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+out(fib({n}))
+"""
+
+    results = {}
+    for engine in lunite.INTERPRETER_ENGINES:
+        lunite.constants.ENGINE = engine
+        times = []
+        for _ in range(iterations):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                lunite.run_code(code)
+                times.append((time.perf_counter() - start) * 1000)
+        results[engine] = min(times)
+        print(f"{Fore.GREEN}{engine:<8}: {results[engine]:.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    lunite.constants.ENGINE = "visitor"
+
+    print(f"{Fore.BLUE}Speedup: {results['visitor'] / results['closure']:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def benchmark_control_flow(iterations=3):
+    print(f"{Fore.CYAN}[ Control Flow: returns and loop jumps ]{Style.RESET_ALL}")
+
+    import lunite
+
+    cases = {
+        "calls": """
+func fib(n) {
+    if (n <= 1) { return n }
+    return fib(n - 1) + fib(n - 2)
+}
+out(fib(20))
+""",
+        "loops": """
+let total = 0
+let i = 0
+while (i < 30000) {
+    i++
+    if (i % 3 == 0) { advance }
+    total += i
+}
+for n in range(0, 30000) {
+    if (n == 29999) { break }
+    if (n % 2 == 0) { advance }
+    total -= 1
+}
+out(total)
+""",
+    }
+
+    for engine in lunite.INTERPRETER_ENGINES:
+        lunite.constants.ENGINE = engine
+        for label, code in cases.items():
+            times = []
+            for _ in range(iterations):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    start = time.perf_counter()
+                    lunite.run_code(code)
+                    times.append((time.perf_counter() - start) * 1000)
+            print(f"{Fore.GREEN}{engine:<8} {label:<6}: {min(times):.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    lunite.constants.ENGINE = "visitor"
+    print("")
+
+def benchmark_tail_calls(depth=20000, repeats=300, iterations=3):
+    print(f"{Fore.CYAN}[ Tail Calls: accumulator recursion ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import lunite
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    function = """
+func total(n, acc) {
+    if (n == 0) { return acc }
+    return total(n - 1, acc + n)
+}
+"""
+    cases = {
+        f"{repeats} x depth 50": function + f"""
+let sum = 0
+for i in range(0, {repeats}) {{
+    sum += total(50, 0)
+}}
+out(sum)
+""",
+        f"depth {depth}": function + f"out(total({depth}, 0))",
+    }
+
+    def run_lbvm(code):
+        BytecodeVM(compile_ast_to_bytecode(code)).run()
 
-    for _ in tqdm(range(iterations), desc="Lexing", colour="cyan"):
+    runners = {engine: lunite.run_code for engine in lunite.INTERPRETER_ENGINES}
+    runners["lbvm"] = run_lbvm
+
+    for engine, run in runners.items():
+        if engine in lunite.INTERPRETER_ENGINES:
+            lunite.constants.ENGINE = engine
+        for label, code in cases.items():
+            times = []
+            for _ in range(iterations):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    start = time.perf_counter()
+                    try:
+                        run(code)
+                    except Exception as e:
+                        print(str(e).splitlines()[0])
+                    times.append((time.perf_counter() - start) * 1000)
+            print(f"{Fore.GREEN}{engine:<8} {label:<17}: {min(times):8.2f} ms -> {output.getvalue().strip().splitlines()[0]}{Style.RESET_ALL}")
+    lunite.constants.ENGINE = "visitor"
+    print("")
+
+def benchmark_memo(n=25):
+    print(f"{Fore.CYAN}[ @memo: fib({n}) from demos/stresstest.luna ]{Style.RESET_ALL}")
+
+    import lunite
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    fib = f"""
+func fib(n) {{
+    if (n <= 1) {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+out(fib({n}))
+"""
+    cases = {"plain": fib, "@memo": "@memo" + fib + "out(fib.stats())\n"}
+
+    def run_lbvm(code):
+        BytecodeVM(compile_ast_to_bytecode(code)).run()
+
+    runners = {engine: lunite.run_code for engine in lunite.INTERPRETER_ENGINES}
+    runners["lbvm"] = run_lbvm
+
+    for engine, run in runners.items():
+        if engine in lunite.INTERPRETER_ENGINES:
+            lunite.constants.ENGINE = engine
+        for label, code in cases.items():
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                run(code)
+                elapsed = (time.perf_counter() - start) * 1000
+            result = ", ".join(output.getvalue().split("\n")).strip(", ")
+            print(f"{Fore.GREEN}{engine:<8} {label:<6}: {elapsed:10.2f} ms -> {result}{Style.RESET_ALL}")
+    lunite.constants.ENGINE = "visitor"
+    print("")
+
+def count_instructions(program):
+    # Instructions an LBVM run executes, counted by wrapping every handler
+    from core.lbvm import BytecodeVM
+
+    vm = BytecodeVM(program)
+    executed = [0]
+    def counting(handler):
+        def run(frame, arg):
+            executed[0] += 1
+            return handler(frame, arg)
+        return run
+    vm.handlers = [counting(handler) for handler in vm.handlers]
+    with contextlib.redirect_stdout(io.StringIO()):
+        vm.run()
+    return executed[0]
+
+def benchmark_dispatch(loops=20000, iterations=3):
+    print(f"{Fore.CYAN}[ LBVM Dispatch: instructions per second by opcode class ({iterations} runs) ]{Style.RESET_ALL}")
+
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    # Each loop body leans on one class of opcode; the loop itself adds the
+    # same GET_ITER/ITER_NEXT/JUMP overhead to all of them
+    cases = {
+        "load/store": "let a = 1\nlet b = 2\nlet c = 3\n"
+                      f"for i in range(0, {loops}) {{ a = b\n b = c\n c = a\n a = c\n b = a }}",
+        "arithmetic": f"let x = 0\nfor i in range(0, {loops}) {{ x = (x + i * 3 - 7) % 1000 ^ (i & 15) << 1 >> 1 }}",
+        "compare/jump": f"let n = 0\nfor i in range(0, {loops}) {{ if (i < 10) {{ n += 1 }} else if (i >= 50 and i != 60) {{ n -= 1 }} }}",
+        "build/index": f"for i in range(0, {loops}) {{ let l = [i, i, i]\n l[0] = l[1] + l[2] }}",
+        "calls": f"func f(v) {{ return v }}\nfor i in range(0, {loops}) {{ f(i)\n f(i) }}",
+        "methods": f"let l = []\nfor i in range(0, {loops}) {{ l.append(i)\n l.pop() }}",
+    }
+
+    for label, code in cases.items():
+        program = compile_ast_to_bytecode(code)
+
+        executed = count_instructions(program)
+
+        times = []
+        for _ in range(iterations):
+            vm = BytecodeVM(program)
+            start = time.perf_counter()
+            vm.run()
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        print(f"{Fore.GREEN}{label:<13}: {executed:>9} instrs {best * 1000:9.2f} ms -> {executed / best / 1e6:6.2f} M instr/s{Style.RESET_ALL}")
+    print("")
+
+def benchmark_vm_loops(loops=50000, iterations=3):
+    print(f"{Fore.CYAN}[ LBVM Loops: plain vs instrumented on arithmetic ({iterations} runs) ]{Style.RESET_ALL}")
+
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    program = compile_ast_to_bytecode(f"""
+let x = 0
+let i = 0
+while (i < {loops}) {{
+    x = (x * 31 + i * 7 - 3) % 65521 ^ (i & 255)
+    i += 1
+}}
+out(x)
+""")
+
+    def run_plain():
+        BytecodeVM(program).run()
+
+    def run_instrumented():
+        # Sandbox checks without a resource monitor, so nothing trips
+        vm = BytecodeVM(program)
+        vm.safe_mode = True
+        vm.run()
+
+    results = {}
+    for label, run in (("plain", run_plain), ("instrumented", run_instrumented)):
+        times = []
+        for _ in range(iterations):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                run()
+                times.append((time.perf_counter() - start) * 1000)
+        results[label] = min(times)
+        print(f"{Fore.GREEN}{label:<13}: {results[label]:8.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Plain loop speedup: {results['instrumented'] / results['plain']:.2f}x{Style.RESET_ALL}")
+    print("")
+
+def benchmark_local_slots(n=22, loops=100000, iterations=3):
+    print(f"{Fore.CYAN}[ LBVM Local Slots: function-heavy bytecode ({iterations} runs) ]{Style.RESET_ALL}")
+
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    cases = {
+        f"fib({n})": f"""
+func fib(n) {{
+    if (n < 2) {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+out(fib({n}))
+""",
+        "while loop": f"""
+func count(limit) {{
+    let total = 0
+    let i = 0
+    while (i < limit) {{
+        total = total + i % 7
+        i += 1
+    }}
+    return total
+}}
+out(count({loops}))
+""",
+        "for + globals": f"""
+let step = 3
+func scan(limit) {{
+    let hits = 0
+    for i in range(0, limit) {{
+        if (i % step == 0) {{ hits += 1 }}
+    }}
+    return hits
+}}
+out(scan({loops}))
+""",
+    }
+
+    for label, code in cases.items():
+        program = compile_ast_to_bytecode(code)
+        times = []
+        for _ in range(iterations):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                BytecodeVM(program).run()
+                times.append((time.perf_counter() - start) * 1000)
+        print(f"{Fore.GREEN}{label:<13}: {min(times):8.2f} ms -> {output.getvalue().strip()}{Style.RESET_ALL}")
+    print("")
+
+def benchmark_peephole(loops=20000, n=20, iterations=3):
+    print(f"{Fore.CYAN}[ LBVM Peephole: executed instructions and time, without -> with ({iterations} runs) ]{Style.RESET_ALL}")
+
+    from core.lbvm import compile_ast_to_bytecode, BytecodeVM
+
+    cases = {
+        "counters": f"""
+let i = 0
+let total = 0
+while (i < {loops}) {{
+    i++
+    total += 2
+}}
+out(total)
+""",
+        "branches": f"""
+func classify(limit) {{
+    let small = 0
+    let big = 0
+    for i in range(0, limit) {{
+        if (i < 100) {{ small = small + 1 }} else if (i >= 1000 and i != 5000) {{ ++big }}
+    }}
+    return small + big
+}}
+out(classify({loops}))
+""",
+        f"fib({n})": f"""
+func fib(n) {{
+    if (n < 2) {{ return n }}
+    return fib(n - 1) + fib(n - 2)
+}}
+out(fib({n}))
+""",
+    }
+
+    for label, code in cases.items():
+        results = []
+        for peephole in (False, True):
+            program = compile_ast_to_bytecode(code, peephole=peephole)
+            times = []
+            for _ in range(iterations):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    BytecodeVM(program).run()
+                    times.append((time.perf_counter() - start) * 1000)
+            results.append((count_instructions(program), min(times)))
+        (before, slow), (after, fast) = results
+        print(f"{Fore.GREEN}{label:<9}: {before:>8} -> {after:>8} instrs ({after / before:.0%}), {slow:8.2f} -> {fast:8.2f} ms{Style.RESET_ALL}")
+    print("")
+
+def benchmark_compile(lines=20000, iterations=3):
+    print(f"{Fore.CYAN}[ LBVM Compile: generated {lines}-line program ({iterations} runs) ]{Style.RESET_ALL}")
+
+    import pickle
+    from core.lexer import Lexer
+    from core.parser import Parser
+    from core.optimizer import optimize
+    from core.lbvm import BytecodeCompiler, BytecodeProgram, optimize_bytecode
+
+    # Every function brings its own names and constants, so the pools grow
+    # with the program
+    source = []
+    i = 0
+    while len(source) + 7 <= lines:
+        source.append(f"func f{i}(a{i}, b{i}) {{")
+        source.append(f"    let t{i} = a{i} * {i} + {i}.5")
+        source.append(f"    if (t{i} > {i * 3}) {{ return \"big{i}\" }}")
+        source.append(f"    return b{i} + \"s{i}\"")
+        source.append("}")
+        source.append(f"let v{i} = f{i}({i}, \"x{i}\")")
+        source.append(f"out(v{i})")
+        i += 1
+    source = "\n".join(source)
+
+    phases = {"parse": [], "compile": [], "peephole": [], "pickle": []}
+    for _ in range(iterations):
         start = time.perf_counter()
-        
-        lexer = lunite.Lexer(code)
-        count = 0
-        while True:
-            t = lexer.get_next_token()
-            count += 1
-            if t.type == lunite.TOKEN_EOF: break
-        
-        end = time.perf_counter()
-        times.append((end - start) * 1000)
-        token_count = count
+        ast = optimize(Parser(Lexer(source)).parse())
+        phases["parse"].append(time.perf_counter() - start)
 
-    avg_time = sum(times) / len(times)
-    print(f"{Fore.BLUE}Source Size : {len(code) / 1024:.2f} KB (Generated){Style.RESET_ALL}")
-    print(f"{Fore.BLUE}Token Count : {token_count} tokens{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}Average Time: {avg_time:.4f} ms{Style.RESET_ALL}")
-    print(f"{Fore.MAGENTA}Speed       : {token_count / (avg_time/1000):.0f} tokens/sec{Style.RESET_ALL}")
+        start = time.perf_counter()
+        compiler = BytecodeCompiler()
+        compiler.compile(ast)
+        program = BytecodeProgram(compiler.instructions, compiler.consts, compiler.names)
+        phases["compile"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        optimize_bytecode(program)
+        phases["peephole"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pickle.dumps(program)
+        phases["pickle"].append(time.perf_counter() - start)
+
+    for phase, times in phases.items():
+        print(f"{Fore.GREEN}{phase:<9}: {min(times) * 1000:9.2f} ms{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Total    : {sum(min(times) for times in phases.values()) * 1000:9.2f} ms "
+          f"({len(program.consts)} consts, {len(program.names)} names){Style.RESET_ALL}")
     print("")
 
 def benchmark_execution(iterations=3):
@@ -106,7 +1204,30 @@ if __name__ == "__main__":
     print(f"{Fore.YELLOW}{Style.BRIGHT}Starting Lunite Speed Test...{Style.RESET_ALL}\n")
     try:
         benchmark_import()
+        check_lexer_backends()
         benchmark_lexer()
+        benchmark_token_storage()
+        benchmark_preprocessor()
+        check_parser_equality()
+        benchmark_parser()
+        benchmark_streaming()
+        benchmark_ast_cache()
+        benchmark_optimizer()
+        benchmark_scope_elision()
+        benchmark_environment_memory()
+        benchmark_instantiation()
+        benchmark_instance_layout()
+        benchmark_inline_caches()
+        benchmark_call_binding()
+        benchmark_engines()
+        benchmark_control_flow()
+        benchmark_tail_calls()
+        benchmark_memo()
+        benchmark_dispatch()
+        benchmark_vm_loops()
+        benchmark_local_slots()
+        benchmark_peephole()
+        benchmark_compile()
         benchmark_execution()
     except KeyboardInterrupt:
         print("\nAborted.")
\ No newline at end of file